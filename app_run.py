@@ -1,10 +1,17 @@
+import queue
 import tkinter as tk
 from tkinter import filedialog
-import subprocess
+
+from launcher_core import ProcessLauncher, describe
+
+# Как часто окно забирает события запуска, мс
+STATUS_POLL_MS = 200
 
 class AppLauncher:
-    def __init__(self, master):
+    def __init__(self, master, launcher=None):
         self.master = master
+        # Процессы запускает и собирает ядро в своём потоке, окно не ждёт их
+        self.launcher = launcher or ProcessLauncher()
         master.title("App Launcher")
 
         self.label = tk.Label(master, text="Выберите приложение для запуска:")
@@ -19,6 +26,19 @@ class AppLauncher:
         self.browse_button = tk.Button(master, text="Обзор", command=self.browse_file)
         self.browse_button.pack(pady=10)
 
+        self.status_label = tk.Label(master, text="Запусков пока не было")
+        self.status_label.pack(pady=5)
+
+        self.process_list = tk.Listbox(master, width=100, height=10)
+        self.process_list.pack(padx=10, pady=10)
+        # Номер запуска -> строка в списке
+        self.rows = {}
+        # Последняя ошибка запуска для строки состояния
+        self.last_error = None
+
+        master.protocol("WM_DELETE_WINDOW", self.close)
+        self.poll_status()
+
     def browse_file(self):
         file_path = filedialog.askopenfilename()
         self.file_path_entry.delete(0, tk.END)
@@ -27,10 +47,47 @@ class AppLauncher:
     def open_app(self):
         app_path = self.file_path_entry.get()
         if app_path:
+            self.launcher.launch(app_path)
+
+    def poll_status(self):
+        # Только get_nowait: главный цикл Tk никогда не ждёт ядро
+        while True:
             try:
-                subprocess.Popen(app_path)
-            except Exception as e:
-                print(f"Ошибка при запуске приложения: {e}")
+                snapshot = self.launcher.events.get_nowait()
+            except queue.Empty:
+                break
+            self.show_launch(snapshot)
+        self.update_summary()
+        self.master.after(STATUS_POLL_MS, self.poll_status)
+
+    def show_launch(self, snapshot):
+        text = describe(snapshot)
+        row = self.rows.get(snapshot["id"])
+        if row is None:
+            self.rows[snapshot["id"]] = self.process_list.size()
+            self.process_list.insert(tk.END, text)
+        else:
+            self.process_list.delete(row)
+            self.process_list.insert(row, text)
+        if snapshot["state"] == "failed" and snapshot["pid"] is None:
+            self.last_error = snapshot["error"]
+
+    def update_summary(self):
+        stats = self.launcher.stats()
+        if not stats["launches"]:
+            return
+        states = ", ".join(f"{state}: {count}" for state, count in stats["states"].items() if count)
+        text = f"Запусков: {stats['launches']} ({states})"
+        if stats["ready_latency_p50"] is not None:
+            text += (f"; готовность p50 {stats['ready_latency_p50'] * 1000:.0f} мс, "
+                     f"p95 {stats['ready_latency_p95'] * 1000:.0f} мс")
+        if self.last_error:
+            text += f"\n{self.last_error}"
+        self.status_label.config(text=text)
+
+    def close(self):
+        self.launcher.shutdown()
+        self.master.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
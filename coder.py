@@ -1,4 +1,7 @@
+import sys
+from bisect import bisect_right
 from string import digits as DIGITS
+from typing import Iterator, TextIO, Union
 
 
 # Константы для символов
@@ -8,6 +11,12 @@ CLOSE_BRACKET = ']'
 # Набор цифр для проверки
 DIGITS_SET = set(DIGITS)
 
+# Размер порции при потоковом декодировании
+CHUNK_SIZE = 1 << 16
+
+# Узел дерева повторений: строка или (число повторений, дочерние узлы, длина одного повтора)
+Node = Union[str, tuple[int, list, int]]
+
 def decode_string(encoded_string: str) -> str:
     """
     Декодирует строку, состоящую из чисел и строк, формируя повторяющиеся подстроки.
@@ -37,10 +46,370 @@ def decode_string(encoded_string: str) -> str:
 
     return current_string
 
+
+def node_length(node: Node) -> int:
+    """
+    Возвращает длину развёртки узла дерева повторений.
+
+    :param node: Строка или узел повторения.
+    :return: Длина декодированного фрагмента.
+    """
+    if isinstance(node, str):
+        return len(node)
+    return node[0] * node[2]
+
+
+def parse_encoded(encoded_string: str) -> list[Node]:
+    """
+    Разбирает закодированную строку в дерево повторений без развёртки.
+
+    Грамматика та же, что в decode_string; соседние символы объединяются
+    в одну строку, а для каждого повторения заранее считается длина.
+
+    :param encoded_string: Закодированная строка.
+    :return: Список узлов верхнего уровня.
+    """
+    stack: list[tuple[int, list[Node]]] = []  # Стек для хранения (количество, узлы)
+    current_num = 0
+    current_nodes: list[Node] = []
+    text: list[str] = []  # Символы, ещё не добавленные в узлы
+
+    for char in encoded_string:
+        if char in DIGITS_SET:
+            current_num = current_num * 10 + int(char)
+        elif char == OPEN_BRACKET:
+            if text:
+                current_nodes.append(''.join(text))
+                text = []
+            stack.append((current_num, current_nodes))
+            current_num, current_nodes = 0, []
+        elif char == CLOSE_BRACKET:
+            if text:
+                current_nodes.append(''.join(text))
+                text = []
+            last_num, parent_nodes = stack.pop()
+            length = sum(node_length(node) for node in current_nodes)
+            parent_nodes.append((last_num, current_nodes, length))
+            current_nodes = parent_nodes
+        else:
+            text.append(char)
+
+    if text:
+        current_nodes.append(''.join(text))
+    return current_nodes
+
+
+def iter_pieces(nodes: list[Node], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Обходит дерево повторений и выдаёт фрагменты развёртки по порядку.
+
+    Обход идёт по явному стеку, поэтому память пропорциональна глубине
+    вложенности, а глубина не ограничена пределом рекурсии. Повторение,
+    один повтор которого не длиннее chunk_size, собирается в буфер один раз
+    и выдаётся блоками не длиннее chunk_size.
+
+    :param nodes: Узлы дерева повторений.
+    :param chunk_size: Желаемый размер фрагмента.
+    :return: Итератор фрагментов строки.
+    """
+    # (узлы, индекс следующего узла, оставшиеся повторы, буфер блока, повторы блока)
+    stack = [[nodes, 0, 1, None, 0]]
+    while stack:
+        frame = stack[-1]
+        children, index, repeats, buffer, block_count = frame
+        if index == len(children):
+            if repeats > 1:
+                frame[1], frame[2] = 0, repeats - 1
+                continue
+            stack.pop()
+            if not block_count:
+                continue
+            # Блок короткого повторения собран: отдаём его родительскому блоку или наружу
+            block = ''.join(buffer)
+            parent_buffer = stack[-1][3]
+            if parent_buffer is not None:
+                parent_buffer.append(block * block_count)
+                continue
+            per_chunk = chunk_size // len(block)
+            full_chunks, rest = divmod(block_count, per_chunk)
+            chunk = block * per_chunk
+            for _ in range(full_chunks):
+                yield chunk
+            if rest:
+                yield block * rest
+            continue
+        frame[1] += 1
+
+        node = children[index]
+        if isinstance(node, str):
+            if buffer is None:
+                yield node
+            else:
+                buffer.append(node)
+            continue
+        count, sub_nodes, length = node
+        if not count or not length:
+            continue
+        if length <= chunk_size:
+            stack.append([sub_nodes, 0, 1, [], count])
+        else:
+            stack.append([sub_nodes, 0, count, None, 0])
+
+
+def iter_decoded(encoded_string: str, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Лениво декодирует строку, выдавая порции примерно по chunk_size символов.
+
+    :param encoded_string: Закодированная строка.
+    :param chunk_size: Размер порции.
+    :return: Итератор порций декодированной строки.
+    """
+    buffer: list[str] = []
+    buffered = 0
+    for piece in iter_pieces(parse_encoded(encoded_string), chunk_size):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def decode_to(encoded_string: str, output: TextIO, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Декодирует строку, записывая результат в файл, сокет (makefile) или stdout.
+
+    :param encoded_string: Закодированная строка.
+    :param output: Объект с методом write.
+    :param chunk_size: Размер порции.
+    :return: Число записанных символов.
+    """
+    written = 0
+    for chunk in iter_decoded(encoded_string, chunk_size):
+        output.write(chunk)
+        written += len(chunk)
+    return written
+
+
+class EncodedString:
+    """
+    Закодированная строка с запросами к декодированной строке без её развёртки.
+
+    Для каждого списка узлов хранятся смещения начала узлов, поэтому символ
+    по индексу находится за O(глубина · log ширины), а срез — дополнительно
+    за время, пропорциональное его длине. Построение и срезы идут по явному
+    стеку, так что глубина вложенности не ограничена пределом рекурсии.
+    """
+
+    def __init__(self, encoded_string: str):
+        self.root = self.build(parse_encoded(encoded_string))
+        self.length = self.root[1][-1]
+
+    @classmethod
+    def build(cls, nodes: list[Node]) -> tuple[list, list[int]]:
+        """
+        Преобразует узлы в группу (узлы, смещения начала узлов и конец группы).
+
+        :param nodes: Узлы дерева повторений.
+        :return: Группа для поиска по смещению.
+        """
+        root: tuple[list, list[int]] = ([], [0])
+        # (итератор по узлам, собираемая группа, исходный узел повторения)
+        stack = [(iter(nodes), root, None)]
+        while stack:
+            children, group, source = stack[-1]
+            node = next(children, None)
+            if node is None:
+                stack.pop()
+                if source is None:
+                    continue
+                # Группа повторения собрана: добавляем узел в родительскую группу
+                node = (source[0], group, source[2])
+                group = stack[-1][1]
+            elif not isinstance(node, str):
+                stack.append((iter(node[1]), ([], [0]), node))
+                continue
+            group_nodes, offsets = group
+            group_nodes.append(node)
+            offsets.append(offsets[-1] + node_length(node))
+        return root
+
+    def __len__(self) -> int:
+        # Длина может не поместиться в sys.maxsize — тогда используйте self.length
+        return self.length
+
+    def index(self, position: int) -> str:
+        """
+        Возвращает символ декодированной строки по индексу.
+
+        :param position: Индекс (отрицательный считается с конца).
+        :return: Символ.
+        :raises IndexError: Если индекс вне строки.
+        """
+        if position < 0:
+            position += self.length
+        if not 0 <= position < self.length:
+            raise IndexError('EncodedString index out of range')
+        nodes, offsets = self.root
+        while True:
+            number = bisect_right(offsets, position) - 1
+            node = nodes[number]
+            position -= offsets[number]
+            if isinstance(node, str):
+                return node[position]
+            count, (nodes, offsets), length = node
+            position %= length
+
+    def slice(self, start: int, stop: int) -> str:
+        """
+        Возвращает срез декодированной строки [start:stop).
+
+        :param start: Начало среза (отрицательное считается с конца).
+        :param stop: Конец среза (отрицательный считается с конца).
+        :return: Подстрока.
+        """
+        start, stop, _ = slice(start, stop).indices(self.length)
+        pieces: list[str] = []
+        if start < stop:
+            self.collect(self.root, start, stop, pieces)
+        return ''.join(pieces)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError('EncodedString slices support only step 1')
+            return self.slice(*key.indices(self.length)[:2])
+        return self.index(key)
+
+    @classmethod
+    def collect(cls, group: tuple[list, list[int]], start: int, stop: int, pieces: list[str]) -> None:
+        """
+        Добавляет в pieces фрагменты группы в диапазоне [start:stop).
+
+        :param group: Группа узлов.
+        :param start: Начало диапазона внутри группы.
+        :param stop: Конец диапазона внутри группы.
+        :param pieces: Список, в который добавляются фрагменты.
+        """
+        # Задачи выполняются с конца списка: (группа, начало, конец, куда добавлять),
+        # готовый фрагмент (строка, куда добавлять) или сборка повтора
+        # (части повтора, число повторов, начало, длина, куда добавлять)
+        tasks: list[tuple] = [(group, start, stop, pieces)]
+        while tasks:
+            task = tasks.pop()
+            if len(task) == 2:
+                task[1].append(task[0])
+                continue
+            if len(task) == 5:
+                block, times, offset, size, output = task
+                output.append((''.join(block) * times)[offset:offset + size])
+                continue
+            (nodes, offsets), start, stop, output = task
+            number = bisect_right(offsets, start) - 1
+            subtasks = []
+            while number < len(nodes) and offsets[number] < stop:
+                node = nodes[number]
+                low = max(start - offsets[number], 0)
+                high = min(stop, offsets[number + 1]) - offsets[number]
+                number += 1
+                if low >= high:
+                    continue
+                if isinstance(node, str):
+                    subtasks.append((node[low:high], output))
+                    continue
+                _, sub_group, length = node
+                first, first_offset = divmod(low, length)
+                last = (high - 1) // length
+                if high - low >= length:
+                    # Диапазон не короче одного повтора: разворачиваем повтор один раз
+                    block: list[str] = []
+                    subtasks.append((sub_group, 0, length, block))
+                    subtasks.append((block, last - first + 1, first_offset, high - low, output))
+                elif first == last:
+                    subtasks.append((sub_group, first_offset, high - first * length, output))
+                else:
+                    subtasks.append((sub_group, first_offset, length, output))
+                    subtasks.append((sub_group, 0, high - last * length, output))
+            tasks.extend(reversed(subtasks))
+
+
+def check(cases: int = 3000, seed: int = 0) -> None:
+    """
+    Сверяет потоковую развёртку и EncodedString с decode_string
+    на случайных и глубоко вложенных строках.
+
+    :param cases: Число случайных строк.
+    :param seed: Зерно генератора.
+    """
+    import random
+
+    rng = random.Random(seed)
+
+    def random_encoded(depth: int) -> str:
+        parts = []
+        for _ in range(rng.randint(1, 3)):
+            if depth and rng.random() < 0.5:
+                parts.append(f'{rng.randint(0, 5)}[{random_encoded(depth - 1)}]')
+            else:
+                parts.append(''.join(rng.choices('abc', k=rng.randint(0, 3))))
+        return ''.join(parts)
+
+    samples = [random_encoded(3) for _ in range(cases)]
+    for depth in (500, 1500, 5000):
+        samples.append('1[' * depth + 'a' + ']' * depth)
+        samples.append('x' + '1[b' * depth + 'a' + ']' * depth + 'y')
+        samples.append('3[' * 4 + '1[' * depth + 'ab' + ']' * (depth + 4))
+    for encoded in samples:
+        expected = decode_string(encoded)
+        for chunk_size in (1, 7, CHUNK_SIZE):
+            decoded = ''.join(iter_decoded(encoded, chunk_size))
+            assert decoded == expected, (encoded[:60], chunk_size)
+        encoded_string = EncodedString(encoded)
+        assert encoded_string.length == len(expected), encoded[:60]
+        assert encoded_string[:] == expected, encoded[:60]
+        for _ in range(5):
+            start, stop = sorted(rng.randint(-len(expected) - 2, len(expected) + 2) for _ in range(2))
+            assert encoded_string[start:stop] == expected[start:stop], (encoded[:60], start, stop)
+            if expected:
+                position = rng.randrange(-len(expected), len(expected))
+                assert encoded_string[position] == expected[position], (encoded[:60], position)
+    print(f'ok: {len(samples)} строк')
+
+
+def benchmark() -> None:
+    """Сравнивает полную развёртку с запросами к EncodedString на вложенных строках."""
+    from timeit import timeit
+
+    print(f"{'depth':>5} {'length':>10} {'decode, ms':>11} {'parse, ms':>10} "
+          f"{'index, us':>10} {'slice 1000, us':>15}")
+    for depth in (10, 14, 18, 22):
+        encoded = '2[' * depth + 'ab' + ']' * depth
+        decode_ms = timeit(lambda: decode_string(encoded), number=1) * 1000
+        parse_ms = timeit(lambda: EncodedString(encoded), number=10) * 100
+        encoded_string = EncodedString(encoded)
+        middle = encoded_string.length // 2
+        index_us = timeit(lambda: encoded_string.index(middle), number=1000) * 1000
+        slice_us = timeit(lambda: encoded_string.slice(middle, middle + 1000), number=1000) * 1000
+        print(f"{depth:>5} {encoded_string.length:>10} {decode_ms:>11.2f} {parse_ms:>10.3f} "
+              f"{index_us:>10.2f} {slice_us:>15.2f}")
+
+
 if __name__ == '__main__':
+    if '--bench' in sys.argv[1:]:
+        benchmark()
+        raise SystemExit
+    if '--check' in sys.argv[1:]:
+        check()
+        raise SystemExit
+
     # Чтение входных данных
     input_string = input()
 
-    # Вывод результата
-    print(decode_string(input_string))
+    # Вывод результата; с флагом --stream — потоково, без сборки строки в памяти
+    if '--stream' in sys.argv[1:]:
+        decode_to(input_string, sys.stdout)
+        sys.stdout.write('\n')
+    else:
+        print(decode_string(input_string))
     #ID успешной посылки 130845887
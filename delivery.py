@@ -1,3 +1,22 @@
+import mmap
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него используются array и списки
+    np = None
+
+# Подсчёт весов вместо сортировки, пока limit не больше этого значения
+COUNTING_LIMIT_MAX = 1 << 22
+# Размер блока при чтении файла с весами, в байтах
+READ_BLOCK_SIZE = 1 << 24
+# Сколько ограничений одного набора весов решается одной задачей пула процессов
+BATCH_LIMITS_PER_TASK = 256
+
+
 def min_transport_platforms(weights: list[int], limit: int) -> int:
     """
     Вычисляет минимальное количество транспортных платформ, необходимых для перевозки роботов с заданными весами.
@@ -17,19 +36,394 @@ def min_transport_platforms(weights: list[int], limit: int) -> int:
 
     return platforms
 
+
+def parse_weights(data: bytes):
+    """
+    Разбирает веса, разделённые пробельными символами, в компактный массив.
+
+    :param data: Байты с весами.
+    :return: Массив NumPy int64 или array('q'), если NumPy не установлен.
+    """
+    if np is not None:
+        # fromstring разбирает пустую строку из пробелов как [0]
+        data = data.strip()
+        if not data:
+            return np.empty(0, dtype=np.int64)
+        return np.fromstring(data, dtype=np.int64, sep=' ')
+    return array('q', map(int, data.split()))
+
+
+def count_weights(weights, limit: int, counts=None) -> tuple:
+    """
+    Подсчитывает, сколько роботов имеют каждый вес от 0 до limit.
+
+    Роботы тяжелее limit ни с кем не объединяются и считаются отдельно.
+
+    :param weights: Веса роботов (список, array или массив NumPy).
+    :param limit: Грузоподъёмность платформы.
+    :param counts: Счётчики предыдущих блоков, к которым добавляются новые.
+    :return: Счётчики по весам и число роботов тяжелее limit.
+    :raises ValueError: Если встретился отрицательный вес.
+    """
+    if np is not None:
+        weights = np.asarray(weights, dtype=np.int64)
+        if weights.size and weights.min() < 0:
+            raise ValueError('Веса должны быть неотрицательными')
+        light = weights[weights <= limit]
+        block_counts = np.bincount(light, minlength=limit + 1)
+        counts = block_counts if counts is None else counts + block_counts
+        return counts, int(weights.size - light.size)
+
+    counts = counts if counts is not None else [0] * (limit + 1)
+    oversize = 0
+    for weight in weights:
+        if weight < 0:
+            raise ValueError('Веса должны быть неотрицательными')
+        if weight > limit:
+            oversize += 1
+        else:
+            counts[weight] += 1
+    return counts, oversize
+
+
+def platforms_from_counts(values, amounts, limit: int) -> int:
+    """
+    Два указателя по различным весам вместо отдельных роботов.
+
+    :param values: Различные веса по возрастанию.
+    :param amounts: Число роботов каждого веса.
+    :param limit: Грузоподъёмность платформы.
+    :return: Минимальное количество платформ.
+    """
+    amounts = list(amounts)
+    left, right, platforms = 0, len(values) - 1, 0
+    while left < right:
+        if values[left] + values[right] <= limit:
+            # Каждый самый тяжёлый робот едет с самым лёгким, пока хватает пар
+            pairs = min(amounts[left], amounts[right])
+            platforms += pairs
+            amounts[left] -= pairs
+            amounts[right] -= pairs
+            if not amounts[left]:
+                left += 1
+            if not amounts[right]:
+                right -= 1
+        else:
+            # Самым тяжёлым не с кем ехать
+            platforms += amounts[right]
+            right -= 1
+    if left == right:
+        # Остались роботы одного веса: по двое, если помещаются
+        remaining = amounts[left]
+        platforms += (remaining + 1) // 2 if 2 * values[left] <= limit else remaining
+    return platforms
+
+
+def platforms_from_weight_counts(counts, oversize: int, limit: int) -> int:
+    """
+    Вычисляет число платформ по счётчикам весов за O(limit) плюс число различных весов.
+
+    :param counts: Число роботов каждого веса от 0 до limit.
+    :param oversize: Число роботов тяжелее limit.
+    :param limit: Грузоподъёмность платформы.
+    :return: Минимальное количество платформ.
+    """
+    if np is not None:
+        values = np.flatnonzero(counts)
+        return oversize + platforms_from_counts(values.tolist(), counts[values].tolist(), limit)
+    values = [weight for weight, amount in enumerate(counts) if amount]
+    return oversize + platforms_from_counts(values, [counts[weight] for weight in values], limit)
+
+
+def min_transport_platforms_bulk(weights, limit: int) -> int:
+    """
+    Вычисляет минимальное количество платформ для больших наборов весов.
+
+    При limit не больше COUNTING_LIMIT_MAX веса подсчитываются (O(n + limit)),
+    иначе группируются сортировкой; результат совпадает с min_transport_platforms.
+
+    :param weights: Веса роботов (список, array или массив NumPy).
+    :param limit: Максимальный вес, который может быть перевезен на одной платформе.
+    :return: Минимальное количество платформ.
+    """
+    if 0 <= limit <= COUNTING_LIMIT_MAX:
+        try:
+            counts, oversize = count_weights(weights, limit)
+        except ValueError:
+            pass
+        else:
+            return platforms_from_weight_counts(counts, oversize, limit)
+
+    if np is not None:
+        values, amounts = np.unique(np.asarray(weights, dtype=np.int64), return_counts=True)
+        return platforms_from_counts(values.tolist(), amounts.tolist(), limit)
+    return min_transport_platforms(list(weights), limit)
+
+
+def iter_weight_blocks(path: str, block_size: int = READ_BLOCK_SIZE):
+    """
+    Читает веса из текстового файла через отображение в память блоками,
+    не загружая файл целиком.
+
+    :param path: Путь к файлу с весами, разделёнными пробельными символами.
+    :param block_size: Размер блока в байтах.
+    :return: Итератор массивов весов.
+    """
+    with open(path, 'rb') as file:
+        if not os.fstat(file.fileno()).st_size:
+            # Пустой файл нельзя отобразить в память
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start, size = 0, len(mapped)
+            while start < size:
+                end = min(start + block_size, size)
+                if end < size:
+                    # Не разрываем число на границе блока
+                    while end > start and not mapped[end - 1:end].isspace():
+                        end -= 1
+                    if end == start:
+                        end = min(start + block_size, size)
+                yield parse_weights(mapped[start:end])
+                start = end
+
+
+def min_transport_platforms_file(path: str, limit: int) -> int:
+    """
+    Вычисляет минимальное количество платформ для весов из файла.
+
+    При limit не больше COUNTING_LIMIT_MAX файл обрабатывается потоково
+    с памятью O(limit + размер блока).
+
+    :param path: Путь к файлу с весами, разделёнными пробельными символами.
+    :param limit: Максимальный вес, который может быть перевезен на одной платформе.
+    :return: Минимальное количество платформ.
+    """
+    if 0 <= limit <= COUNTING_LIMIT_MAX:
+        counts, oversize = None, 0
+        for block in iter_weight_blocks(path):
+            counts, block_oversize = count_weights(block, limit, counts)
+            oversize += block_oversize
+        if counts is None:
+            return 0
+        return platforms_from_weight_counts(counts, oversize, limit)
+
+    weights = array('q')
+    for block in iter_weight_blocks(path):
+        weights.extend(block.tolist() if np is not None else block)
+    return min_transport_platforms_bulk(weights, limit)
+
+
+def sort_weights(weights):
+    """
+    Сортирует веса один раз для ответа на много ограничений.
+
+    :param weights: Веса роботов (список, array или массив NumPy).
+    :return: Отсортированный массив NumPy или список.
+    """
+    if np is not None:
+        return np.sort(np.asarray(weights, dtype=np.int64))
+    return sorted(weights)
+
+
+def pairs_fit(sorted_weights, pairs: int, limit: int) -> bool:
+    """
+    Проверяет, можно ли составить pairs пар: самые лёгкие 2 * pairs роботов
+    объединяются от краёв к середине.
+
+    :param sorted_weights: Отсортированные веса.
+    :param pairs: Число пар (больше нуля).
+    :param limit: Грузоподъёмность платформы.
+    :return: True, если все пары помещаются на платформы.
+    """
+    if np is not None:
+        sums = sorted_weights[:pairs] + sorted_weights[2 * pairs - 1:pairs - 1:-1]
+        return bool(sums.max() <= limit)
+    return all(sorted_weights[i] + sorted_weights[2 * pairs - 1 - i] <= limit for i in range(pairs))
+
+
+def max_pairs(sorted_weights, limit: int, low: int = 0) -> int:
+    """
+    Находит наибольшее число пар двоичным поиском: если помещаются k пар,
+    то помещаются и k - 1.
+
+    :param sorted_weights: Отсортированные веса.
+    :param limit: Грузоподъёмность платформы.
+    :param low: Заведомо допустимое число пар.
+    :return: Наибольшее число пар.
+    """
+    high = len(sorted_weights) // 2
+    while low < high:
+        middle = (low + high + 1) // 2
+        if pairs_fit(sorted_weights, middle, limit):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def solve_limits(weights, limits: list[int], presorted: bool = False) -> list[int]:
+    """
+    Отвечает на много ограничений для одного набора весов.
+
+    Веса сортируются один раз; ограничения обходятся по возрастанию,
+    и найденное число пар служит нижней границей для следующего.
+
+    :param weights: Веса роботов.
+    :param limits: Ограничения грузоподъёмности.
+    :param presorted: Веса уже отсортированы.
+    :return: Минимальное количество платформ для каждого ограничения.
+    """
+    sorted_weights = weights if presorted else sort_weights(weights)
+    results = [0] * len(limits)
+    pairs = 0
+    for index in sorted(range(len(limits)), key=limits.__getitem__):
+        pairs = max_pairs(sorted_weights, limits[index], pairs)
+        results[index] = len(sorted_weights) - pairs
+    return results
+
+
+def solve_scenarios(scenarios, workers: int | None = None):
+    """
+    Решает много сценариев «веса, ограничение» в пуле процессов.
+
+    Сценарии с одним и тем же объектом весов объединяются и сортируют веса
+    один раз. Все сценарии читаются заранее, результаты выдаются в исходном
+    порядке по мере готовности.
+
+    :param scenarios: Итерируемое пар (веса, ограничение или список ограничений).
+    :param workers: Число процессов; 0 или 1 — решать в текущем процессе.
+    :return: Итератор результатов: число для одного ограничения, список для списка.
+    """
+    # id(весов) -> (веса, ограничения всех сценариев с этими весами)
+    groups: dict[int, tuple] = {}
+    # Для каждого сценария: группа, срез её ограничений, было ли ограничение числом
+    plan = []
+    for weights, limits in scenarios:
+        scalar = isinstance(limits, int)
+        limits = [limits] if scalar else list(limits)
+        group = groups.setdefault(id(weights), (weights, []))
+        start = len(group[1])
+        group[1].extend(limits)
+        plan.append((id(weights), start, start + len(limits), scalar))
+
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1:
+        results = {key: solve_limits(weights, limits) for key, (weights, limits) in groups.items()}
+        for key, start, stop, scalar in plan:
+            answers = results[key][start:stop]
+            yield answers[0] if scalar else answers
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures: dict[int, list] = {}
+        for key, (weights, limits) in groups.items():
+            if len(limits) > BATCH_LIMITS_PER_TASK:
+                # Большую группу делим между процессами, отсортировав веса один раз здесь
+                weights, presorted = sort_weights(weights), True
+            else:
+                presorted = False
+            futures[key] = [
+                executor.submit(solve_limits, weights, limits[start:start + BATCH_LIMITS_PER_TASK], presorted)
+                for start in range(0, len(limits), BATCH_LIMITS_PER_TASK)
+            ]
+        for key, start, stop, scalar in plan:
+            answers = []
+            for index in range(start // BATCH_LIMITS_PER_TASK, (stop - 1) // BATCH_LIMITS_PER_TASK + 1):
+                offset = index * BATCH_LIMITS_PER_TASK
+                chunk = futures[key][index].result()
+                answers.extend(chunk[max(start - offset, 0):stop - offset])
+            yield answers[0] if scalar else answers
+
+
 def main() -> None:
-    input_weights: str = input().strip()
-    limit: int = int(input().strip())
+    input_weights: bytes = sys.stdin.buffer.readline()
+    limit: int = int(sys.stdin.buffer.readline())
 
-    # Преобразование массива строк в массив целых чисел с использованием list comprehension
-    weights: list[int] = [int(weight) for weight in input_weights.split()]
+    # Разбор весов сразу в компактный массив, без промежуточного списка строк
+    weights = parse_weights(input_weights)
 
     # Вывод результата сразу в print
-    print(min_transport_platforms(weights, limit))
+    print(min_transport_platforms_bulk(weights, limit))
+
+
+def benchmark(size: int, limit: int) -> None:
+    """
+    Сравнивает исходный разбор и сортировку с массовым подсчётом.
+
+    :param size: Число роботов.
+    :param limit: Грузоподъёмность платформы.
+    """
+    import random
+    import time
+
+    data = ' '.join(str(random.randint(1, limit)) for _ in range(size)).encode()
+
+    started = time.perf_counter()
+    weights = [int(weight) for weight in data.decode().split()]
+    parsed = time.perf_counter()
+    expected = min_transport_platforms(weights, limit)
+    finished = time.perf_counter()
+    print(f'list + sorted:   parse {parsed - started:6.3f} s, solve {finished - parsed:6.3f} s')
+
+    started = time.perf_counter()
+    weights = parse_weights(data)
+    parsed = time.perf_counter()
+    result = min_transport_platforms_bulk(weights, limit)
+    finished = time.perf_counter()
+    print(f'array + counts:  parse {parsed - started:6.3f} s, solve {finished - parsed:6.3f} s')
+    assert result == expected
+
+
+def benchmark_batch(size: int, scenarios: int, weight_sets: int, workers: int | None) -> None:
+    """
+    Сравнивает последовательный вызов min_transport_platforms для каждого
+    сценария с solve_scenarios.
+
+    :param size: Число роботов в наборе весов.
+    :param scenarios: Число сценариев.
+    :param weight_sets: Число различных наборов весов.
+    :param workers: Число процессов пула.
+    """
+    import random
+    import time
+
+    sets = [[random.randint(1, 1000) for _ in range(size)] for _ in range(weight_sets)]
+    tasks = [(random.choice(sets), random.randint(1, 2000)) for _ in range(scenarios)]
+
+    started = time.perf_counter()
+    expected = [min_transport_platforms(weights, limit) for weights, limit in tasks]
+    print(f'serial:  {time.perf_counter() - started:6.3f} s')
+
+    started = time.perf_counter()
+    result = list(solve_scenarios(tasks, workers))
+    print(f'batch:   {time.perf_counter() - started:6.3f} s')
+    assert result == expected
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1:
+        import argparse
+
+        parser = argparse.ArgumentParser(description='Минимальное число транспортных платформ')
+        parser.add_argument('--file', help='файл с весами (ограничение — аргумент --limit)')
+        parser.add_argument('--limit', type=int, default=1000)
+        parser.add_argument('--bench', type=int, metavar='SIZE', help='бенчмарк на SIZE случайных весах')
+        parser.add_argument('--batch', type=int, metavar='SCENARIOS',
+                            help='бенчмарк пакетного решения SCENARIOS сценариев')
+        parser.add_argument('--size', type=int, default=100_000, help='роботов в наборе для --batch')
+        parser.add_argument('--weight-sets', type=int, default=4, help='наборов весов для --batch')
+        parser.add_argument('--workers', type=int, default=None, help='процессов для --batch')
+        args = parser.parse_args()
+        if args.bench:
+            benchmark(args.bench, args.limit)
+        elif args.batch:
+            benchmark_batch(args.size, args.batch, args.weight_sets, args.workers)
+        elif args.file:
+            print(min_transport_platforms_file(args.file, args.limit))
+        else:
+            parser.error('укажите --file, --bench или --batch')
+    else:
+        main()
 
 # ID успешной посылки: 130729405
 
@@ -3,10 +3,49 @@
 from gameparts import Board
 # Добавился ещё один импорт - исключение CellOccupiedError.
 from gameparts import CellOccupiedError, FieldIndexError
+from tictactoe_engine import BitBoard, Searcher
 
 
-def main():
+def read_move(game):
+    """Запросить у игрока номер строки и столбца свободной клетки."""
+    # Запускается бесконечный цикл.
+    while True:
+        try:
+            row = int(input('Введите номер строки: '))
+            if row < 0 or row >= game.field_size:
+                raise FieldIndexError
+            column = int(input('Введите номер столбца: '))
+            if column < 0 or column >= game.field_size:
+                raise FieldIndexError
+            if game.board[row][column] != ' ':
+                # Вот тут выбрасывается новое исключение.
+                raise CellOccupiedError
+        except FieldIndexError:
+            print(
+                'Значение должно быть неотрицательным и меньше '
+                f'{game.field_size}.'
+            )
+            print('Введите значения для строки и столбца заново.')
+            continue
+        except CellOccupiedError:
+            print('Ячейка занята')
+            print('Введите другие координаты.')
+            continue
+        except ValueError:
+            print('Буквы вводить нельзя. Только числа.')
+            print('Введите значения для строки и столбца заново.')
+            continue
+        except Exception as e:
+            print(f'Возникла ошибка: {e}')
+        else:
+            return row, column
+
+
+def main(computer=None, win_length=None, time_budget=1.0):
     game = Board()
+    # Битовая доска повторяет ходы и отвечает, закончилась ли партия
+    engine = BitBoard(game.field_size, win_length)
+    searcher = Searcher(engine)
     current_player = 'X'
     running = True
     game.display()
@@ -15,42 +54,34 @@ def main():
 
         print(f'Ход делают {current_player}')
 
-        # Запускается бесконечный цикл.
-        while True:
-            try:
-                row = int(input('Введите номер строки: '))
-                if row < 0 or row >= game.field_size:
-                    raise FieldIndexError
-                column = int(input('Введите номер столбца: '))
-                if column < 0 or column >= game.field_size:
-                    raise FieldIndexError
-                if game.board[row][column] != ' ':
-                    # Вот тут выбрасывается новое исключение.
-                    raise CellOccupiedError
-            except FieldIndexError:
-                print(
-                    'Значение должно быть неотрицательным и меньше '
-                    f'{game.field_size}.'
-                )
-                print('Введите значения для строки и столбца заново.')
-                continue
-            except CellOccupiedError:
-                print('Ячейка занята')
-                print('Введите другие координаты.')
-                continue
-            except ValueError:
-                print('Буквы вводить нельзя. Только числа.')
-                print('Введите значения для строки и столбца заново.')
-                continue
-            except Exception as e:
-                print(f'Возникла ошибка: {e}')
-            else:
-                break
+        if current_player == computer:
+            move, _, _ = searcher.search(time_budget)
+            row, column = divmod(move, game.field_size)
+            print(f'Компьютер ходит в строку {row}, столбец {column}')
+        else:
+            row, column = read_move(game)
 
         game.make_move(row, column, current_player)
         game.display()
+        engine.play(row * game.field_size + column)
+        if engine.winner is not None:
+            print(f'Победили {current_player}!')
+            running = False
+        elif engine.is_full():
+            print('Ничья!')
+            running = False
         current_player = 'O' if current_player == 'X' else 'X'
 
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Крестики-нолики')
+    parser.add_argument('--computer', choices=('X', 'O'),
+                        help='за кого играет компьютер')
+    parser.add_argument('--win', type=int, default=None,
+                        help='сколько знаков в ряд нужно для победы')
+    parser.add_argument('--time', type=float, default=1.0,
+                        help='время на ход компьютера, с')
+    args = parser.parse_args()
+    main(args.computer, args.win, args.time)
@@ -1,12 +1,22 @@
+import queue
 import tkinter as tk
+
 import keyboard
-import subprocess
-import os
+
+from hotkey_engine import HotkeyEngine
+
+# Как часто окно обновляет список привязок и задержки, мс
+STATUS_POLL_MS = 500
+
 
 class HotkeyApp:
-    def __init__(self, master):
+    def __init__(self, master, engine=None):
         self.master = master
         master.title("Hotkey Manager")
+        # Привязки из файла; команды запускаются в пуле ядра, а не в потоке перехвата
+        self.engine = engine or HotkeyEngine.from_config()
+        # Сочетание -> обработчик keyboard, чтобы снимать только его
+        self.hooks = {}
 
         self.label = tk.Label(master, text="Назначьте горячую клавишу для команды:")
         self.label.pack(pady=10)
@@ -16,7 +26,7 @@ class HotkeyApp:
 
         self.command_entry = tk.Entry(master, width=50)
         self.command_entry.pack(pady=10)
-        self.command_entry.insert(0, "open_browser, open_pycharm, open_project_dir")  # Подсказка по командам
+        self.command_entry.insert(0, ", ".join(self.engine.registry.commands))  # Подсказка по командам
 
         self.set_button = tk.Button(master, text="Назначить горячую клавишу", command=self.set_hotkey)
         self.set_button.pack(pady=10)
@@ -24,53 +34,70 @@ class HotkeyApp:
         self.status_label = tk.Label(master, text="")
         self.status_label.pack(pady=10)
 
+        self.bindings_list = tk.Listbox(master, width=60, height=8)
+        self.bindings_list.pack(padx=10, pady=10)
+
+        self.stats_label = tk.Label(master, text="")
+        self.stats_label.pack(pady=10)
+
+        for hotkey in self.engine.registry.bindings:
+            self.hook(hotkey)
+        self.show_bindings()
+        master.protocol("WM_DELETE_WINDOW", self.close)
+        self.poll_status()
+
+    def hook(self, hotkey):
+        if hotkey in self.hooks:
+            keyboard.remove_hotkey(self.hooks.pop(hotkey))
+        self.hooks[hotkey] = keyboard.add_hotkey(hotkey, self.engine.on_hotkey, args=(hotkey,))
+
     def set_hotkey(self):
         hotkey = self.hotkey_entry.get()
         command = self.command_entry.get().strip()
 
         if hotkey and command:
-            # Удаляем предыдущие горячие клавиши
-            keyboard.unhook_all_hotkeys()
-            # Назначаем новую горячую клавишу
-            keyboard.add_hotkey(hotkey, self.execute_command, args=(command,))  # Используем кортеж
+            try:
+                # Остальные привязки остаются на месте
+                hotkey = self.engine.bind(hotkey, command)
+            except KeyError:
+                self.status_label.config(text="Неизвестная команда.")
+                return
+            self.hook(hotkey)
+            self.show_bindings()
             self.status_label.config(text=f"Горячая клавиша '{hotkey}' назначена для команды '{command}'!")
         else:
             self.status_label.config(text="Пожалуйста, введите горячую клавишу и команду.")
 
-    def execute_command(self, command):
-        if command == "open_browser":
-            self.open_browser()
-        elif command == "open_pycharm":
-            self.open_pycharm()
-        elif command == "open_project_dir":
-            self.open_project_directory()
-        else:
-            self.status_label.config(text="Неизвестная команда.")
-
-    def open_browser(self):
-        try:
-            # Открытие браузера (например, Google Chrome)
-            subprocess.Popen(["C:\Users\goldi\AppData\Local\Yandex\YandexBrowser\Application\browser.exe"])
-        except Exception as e:
-            print(f"Ошибка при запуске браузера: {e}")
-
-    def open_pycharm(self):
-        try:
-            # Укажите путь к вашему PyCharm
-            subprocess.Popen(["C:\Program Files\JetBrains\PyCharm2024.2"])
-        except Exception as e:
-            print(f"Ошибка при запуске PyCharm: {e}")
-
-    def open_project_directory(self):
-        try:
-            # Укажите путь к директории с проектами
-            project_dir = "C:\Users\goldi\PycharmProjects\flaskProject"  # Замените на ваш путь
-            os.startfile(project_dir)  # Открытие директории в проводнике
-        except Exception as e:
-            print(f"Ошибка при открытии директории: {e}")
+    def show_bindings(self):
+        self.bindings_list.delete(0, tk.END)
+        for hotkey, command in self.engine.registry.bindings.items():
+            self.bindings_list.insert(tk.END, f"{hotkey} -> {command}")
+
+    def poll_status(self):
+        # Ошибки запуска приходят из ядра; окно забирает их без ожидания
+        while True:
+            try:
+                snapshot = self.engine.launcher.events.get_nowait()
+            except queue.Empty:
+                break
+            if snapshot["state"] == "failed" and snapshot["pid"] is None:
+                self.status_label.config(text=snapshot["error"])
+        stats = self.engine.stats()
+        if stats["launch_latency_p50"] is not None:
+            self.stats_label.config(
+                text=f"Нажатий: {stats['presses']}; от нажатия до запуска "
+                     f"p50 {stats['launch_latency_p50'] * 1000:.0f} мс, "
+                     f"p95 {stats['launch_latency_p95'] * 1000:.0f} мс")
+        self.master.after(STATUS_POLL_MS, self.poll_status)
+
+    def close(self):
+        for handle in self.hooks.values():
+            keyboard.remove_hotkey(handle)
+        self.engine.launcher.shutdown()
+        self.master.destroy()
+
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = HotkeyApp(root)
     root.mainloop()
-
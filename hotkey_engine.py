@@ -0,0 +1,296 @@
+"""
+Движок горячих клавиш для hot_keys.py, не зависящий от Tk и keyboard.
+
+Привязки «клавиша -> команда» хранятся в JSON-файле. Нажатие ищет готовую
+команду в словаре и передаёт запуск в launcher_core.ProcessLauncher, так что
+поток перехвата клавиатуры не ждёт запуска процесса. Замеряется время
+в потоке перехвата и задержка от нажатия до создания процесса.
+
+Проверка без клавиатуры: python hotkey_engine.py --simulate 1000 --rate 500
+"""
+import json
+import os
+import random
+import sys
+import threading
+from collections import deque
+from time import monotonic, sleep
+
+from launcher_core import ProcessLauncher, percentile
+
+# Файл привязок по умолчанию
+HOTKEYS_CONFIG = os.environ.get("HOTKEYS_CONFIG", "hotkeys.json")
+# Сколько последних замеров времени в потоке перехвата хранить
+LATENCY_SAMPLES = 10000
+
+# Команды по умолчанию: "run" — аргументы процесса, "open" — файл или папка
+DEFAULT_COMMANDS = {
+    "open_browser": {"run": [r"C:\Users\goldi\AppData\Local\Yandex\YandexBrowser\Application\browser.exe"]},
+    "open_pycharm": {"run": [r"C:\Program Files\JetBrains\PyCharm2024.2"]},
+    "open_project_dir": {"open": r"C:\Users\goldi\PycharmProjects\flaskProject"},
+}
+
+
+def run_command(value) -> list[str]:
+    """
+    Аргументы процесса из значения "run": строка — путь к программе без
+    аргументов, список — путь и аргументы.
+
+    :raises ValueError: Если значение не строка и не непустой список строк.
+    """
+    if isinstance(value, str) and value:
+        return [value]
+    if isinstance(value, list) and value and all(isinstance(argument, str) for argument in value):
+        return list(value)
+    raise ValueError(f"\"run\" должно быть строкой или непустым списком строк, а не {value!r}")
+
+
+def open_command(path: str) -> list[str]:
+    """Команда, открывающая файл или папку программой по умолчанию."""
+    if not isinstance(path, str) or not path:
+        raise ValueError(f"\"open\" должно быть путём к файлу или папке, а не {path!r}")
+    if sys.platform == "win32":
+        return ["explorer", path]
+    if sys.platform == "darwin":
+        return ["open", path]
+    return ["xdg-open", path]
+
+
+# Вид команды -> построение аргументов процесса
+COMMAND_BUILDERS = {
+    "run": run_command,
+    "open": open_command,
+}
+
+
+def build_command(spec: dict) -> list[str]:
+    """
+    Превращает описание команды из файла в аргументы процесса.
+
+    :param spec: Словарь с одним ключом из COMMAND_BUILDERS.
+    :return: Аргументы для Popen.
+    :raises ValueError: Если вид команды неизвестен.
+    """
+    for kind, value in spec.items():
+        builder = COMMAND_BUILDERS.get(kind)
+        if builder is None:
+            raise ValueError(f"Неизвестный вид команды: {kind}")
+        return builder(value)
+    raise ValueError("Пустое описание команды")
+
+
+def normalize_hotkey(hotkey: str) -> str:
+    """Приводит сочетание к виду «ctrl+alt+b»."""
+    return "+".join(part.strip().lower() for part in hotkey.split("+"))
+
+
+class HotkeyRegistry:
+    """Команды и привязки клавиш, сохраняемые в JSON-файле."""
+
+    def __init__(self, path: str | None = None, commands: dict | None = None,
+                 bindings: dict | None = None):
+        self.path = path
+        self.commands: dict[str, dict] = dict(DEFAULT_COMMANDS if commands is None else commands)
+        self.bindings: dict[str, str] = dict(bindings or {})
+
+    @classmethod
+    def load(cls, path: str) -> "HotkeyRegistry":
+        """
+        Загружает привязки из файла; если файла нет — команды по умолчанию.
+
+        :param path: Путь к JSON-файлу.
+        :return: Реестр.
+        """
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(path, data.get("commands"), data.get("bindings"))
+
+    def save(self) -> None:
+        """Сохраняет реестр в файл целиком через временный файл."""
+        if not self.path:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"commands": self.commands, "bindings": self.bindings},
+                      file, ensure_ascii=False, indent=4)
+        os.replace(temporary, self.path)
+
+    def bind(self, hotkey: str, command: str) -> str:
+        """
+        Назначает команду сочетанию клавиш, не трогая остальные привязки.
+
+        :param hotkey: Сочетание клавиш.
+        :param command: Имя команды из commands.
+        :return: Нормализованное сочетание.
+        :raises KeyError: Если команды нет в реестре.
+        """
+        if command not in self.commands:
+            raise KeyError(command)
+        hotkey = normalize_hotkey(hotkey)
+        self.bindings[hotkey] = command
+        self.save()
+        return hotkey
+
+    def unbind(self, hotkey: str) -> None:
+        """Удаляет привязку сочетания."""
+        if self.bindings.pop(normalize_hotkey(hotkey), None) is not None:
+            self.save()
+
+
+class HotkeyEngine:
+    """
+    Таблица «сочетание -> аргументы процесса» для мгновенного поиска
+    при нажатии и запуск команд через ProcessLauncher.
+    """
+
+    def __init__(self, registry: HotkeyRegistry, launcher: ProcessLauncher | None = None):
+        self.registry = registry
+        self.launcher = launcher or ProcessLauncher()
+        self.table: dict[str, list[str]] = {}
+        self.presses = 0
+        self.unknown = 0
+        # Время от нажатия до передачи запуска, с, в потоке перехвата
+        self.dispatch_times: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.rebuild()
+
+    @classmethod
+    def from_config(cls, path: str = HOTKEYS_CONFIG) -> "HotkeyEngine":
+        """Создаёт движок с привязками из файла."""
+        return cls(HotkeyRegistry.load(path))
+
+    def rebuild(self) -> None:
+        """
+        Пересобирает таблицу; поток перехвата видит старую или новую целиком.
+
+        :raises ValueError: Если описание команды в файле неверно.
+        """
+        commands = {}
+        for name, spec in self.registry.commands.items():
+            try:
+                commands[name] = build_command(spec)
+            except ValueError as error:
+                raise ValueError(f"Команда {name!r} в {self.registry.path or 'реестре'}: {error}") from error
+        self.table = {hotkey: commands[name] for hotkey, name in self.registry.bindings.items()
+                      if name in commands}
+
+    def bind(self, hotkey: str, command: str) -> str:
+        """Назначает команду сочетанию и обновляет таблицу; см. HotkeyRegistry.bind."""
+        hotkey = self.registry.bind(hotkey, command)
+        self.rebuild()
+        return hotkey
+
+    def unbind(self, hotkey: str) -> None:
+        """Удаляет привязку и обновляет таблицу."""
+        self.registry.unbind(hotkey)
+        self.rebuild()
+
+    def on_hotkey(self, hotkey: str, pressed_at: float | None = None):
+        """
+        Обрабатывает нажатие в потоке перехвата: поиск в словаре
+        и постановка запуска в очередь, без ожидания процесса.
+
+        :param hotkey: Нормализованное сочетание.
+        :param pressed_at: Момент нажатия по monotonic(); по умолчанию сейчас.
+        :return: Future запуска или None, если сочетание не назначено.
+        """
+        pressed_at = monotonic() if pressed_at is None else pressed_at
+        self.presses += 1
+        command = self.table.get(hotkey)
+        if command is None:
+            self.unknown += 1
+            return None
+        future = self.launcher.launch(command, requested_at=pressed_at)
+        self.dispatch_times.append(monotonic() - pressed_at)
+        return future
+
+    def stats(self) -> dict:
+        """Возвращает число нажатий и задержки в потоке перехвата и до запуска."""
+        dispatch = sorted(self.dispatch_times)
+        launcher = self.launcher.stats()
+        return {
+            "presses": self.presses,
+            "unknown": self.unknown,
+            "dispatch_p50": percentile(dispatch, 0.5),
+            "dispatch_p95": percentile(dispatch, 0.95),
+            "dispatch_max": dispatch[-1] if dispatch else None,
+            "launch_latency_p50": launcher["launch_latency_p50"],
+            "launch_latency_p95": launcher["launch_latency_p95"],
+            "states": launcher["states"],
+        }
+
+
+class SimulatedKeySource:
+    """
+    Источник нажатий без клавиатуры: вызывает обработчик из своего потока,
+    как это делает перехват keyboard, с заданной частотой.
+    """
+
+    def __init__(self, handler, hotkeys: list[str], rate: float = 100.0, seed: int | None = None):
+        self.handler = handler
+        self.hotkeys = hotkeys
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.thread = None
+
+    def start(self, presses: int) -> None:
+        """Запускает поток, который сделает presses нажатий."""
+        self.thread = threading.Thread(target=self.run, args=(presses,), name="simulated-keys", daemon=True)
+        self.thread.start()
+
+    def run(self, presses: int) -> None:
+        """Нажимает случайные сочетания через равные промежутки времени."""
+        interval = 1 / self.rate
+        next_press = monotonic()
+        for _ in range(presses):
+            delay = next_press - monotonic()
+            if delay > 0:
+                sleep(delay)
+            self.handler(self.rng.choice(self.hotkeys), monotonic())
+            next_press += interval
+
+    def join(self) -> None:
+        """Ждёт окончания нажатий."""
+        if self.thread is not None:
+            self.thread.join()
+
+
+def simulate(presses: int, rate: float, command: list[str], bindings: int) -> None:
+    """
+    Прогоняет нажатия через движок и печатает задержки.
+
+    :param presses: Число нажатий.
+    :param rate: Нажатий в секунду.
+    :param command: Команда, назначенная всем сочетаниям.
+    :param bindings: Число назначенных сочетаний; одно сочетание остаётся свободным.
+    """
+    registry = HotkeyRegistry(commands={"bench": {"run": command}})
+    hotkeys = [registry.bind(f"ctrl+alt+{index}", "bench") for index in range(bindings)]
+    engine = HotkeyEngine(registry)
+    source = SimulatedKeySource(engine.on_hotkey, hotkeys + ["ctrl+alt+unbound"], rate, seed=0)
+    source.start(presses)
+    source.join()
+    while engine.launcher.stats()["active"]:
+        sleep(0.01)
+    stats = engine.stats()
+    engine.launcher.shutdown()
+
+    print(f"нажатий: {stats['presses']}, без привязки: {stats['unknown']}, запуски: {stats['states']}")
+    print(f"в потоке перехвата: p50 {stats['dispatch_p50'] * 1e6:.0f} мкс, "
+          f"p95 {stats['dispatch_p95'] * 1e6:.0f} мкс, max {stats['dispatch_max'] * 1e6:.0f} мкс")
+    print(f"от нажатия до процесса: p50 {stats['launch_latency_p50'] * 1000:.1f} мс, "
+          f"p95 {stats['launch_latency_p95'] * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    import argparse
+    import shlex
+
+    parser = argparse.ArgumentParser(description="Проверка движка горячих клавиш без клавиатуры")
+    parser.add_argument("--simulate", type=int, metavar="PRESSES", default=1000)
+    parser.add_argument("--rate", type=float, default=200.0, help="нажатий в секунду")
+    parser.add_argument("--bindings", type=int, default=9)
+    parser.add_argument("--command", default=f'"{sys.executable}" -c pass', help="команда для запуска")
+    args = parser.parse_args()
+    simulate(args.simulate, args.rate, shlex.split(args.command), args.bindings)
@@ -0,0 +1,386 @@
+"""
+Ядро запуска приложений для app_run.py, не зависящее от Tk.
+
+Процессы запускаются и собираются в отдельном потоке с циклом asyncio:
+число одновременных запусков ограничено, для каждого запуска замеряются
+ожидание в очереди, задержка до готовности, время работы и ресурсы.
+Изменения записей складываются в очередь events, которую окно забирает
+без ожидания. Завершившиеся запуски не хранятся: статистика ведётся
+счётчиками по состояниям и последними LATENCY_SAMPLES замерами задержек.
+
+Бенчмарк: python launcher_core.py --bench 200 --limit 8
+"""
+import asyncio
+import os
+import queue
+import subprocess
+import threading
+from collections import deque
+from time import monotonic
+
+# Сколько приложений может запускаться одновременно
+MAX_CONCURRENT_LAUNCHES = 4
+# Сколько ждать готовности приложения, с
+READY_TIMEOUT = 30.0
+# Как часто проверять готовность, с
+READY_POLL_INTERVAL = 0.1
+# Сколько последних замеров задержки запуска и готовности хранить
+LATENCY_SAMPLES = 10000
+# Сколько непрочитанных событий хранить; при переполнении теряются самые старые
+MAX_EVENTS = 10000
+
+# Состояния запуска
+QUEUED = "queued"
+STARTING = "starting"
+RUNNING = "running"
+# Процесс работает, но проверка готовности не прошла за ready_timeout
+UNRESPONSIVE = "unresponsive"
+EXITED = "exited"
+FAILED = "failed"
+STATES = (QUEUED, STARTING, RUNNING, UNRESPONSIVE, EXITED, FAILED)
+# Состояния, после которых запись больше не меняется
+FINISHED_STATES = (EXITED, FAILED)
+
+
+class LaunchRecord:
+    """Состояние и замеры одного запуска; время — по monotonic()."""
+
+    def __init__(self, launch_id: int, command, requested_at: float | None = None):
+        self.id = launch_id
+        self.command = command
+        self.state = QUEUED
+        self.pid = None
+        self.returncode = None
+        self.error = None
+        self.requested_at = monotonic() if requested_at is None else requested_at
+        self.admitted_at = None
+        self.started_at = None
+        self.ready_at = None
+        self.exited_at = None
+        # Процессорное время (user + system), с, и пиковая память из rusage
+        self.cpu_time = None
+        self.max_rss = None
+
+    def snapshot(self) -> dict:
+        """Возвращает копию записи с вычисленными задержками."""
+        return {
+            "id": self.id,
+            "command": self.command,
+            "state": self.state,
+            "pid": self.pid,
+            "returncode": self.returncode,
+            "error": self.error,
+            "queue_wait": elapsed(self.requested_at, self.admitted_at),
+            "spawn_time": elapsed(self.admitted_at, self.started_at),
+            "launch_latency": elapsed(self.requested_at, self.started_at),
+            "ready_latency": elapsed(self.requested_at, self.ready_at),
+            "runtime": elapsed(self.started_at, self.exited_at),
+            "cpu_time": self.cpu_time,
+            "max_rss": self.max_rss,
+        }
+
+
+def elapsed(start: float | None, end: float | None) -> float | None:
+    """Разница моментов времени или None, если один из них неизвестен."""
+    if start is None or end is None:
+        return None
+    return end - start
+
+
+def describe(snapshot: dict) -> str:
+    """
+    Форматирует запись запуска одной строкой для интерфейса.
+
+    :param snapshot: Результат LaunchRecord.snapshot().
+    :return: Строка вида «#1 running pid 42 app: готово за 12 мс».
+    """
+    parts = [f"#{snapshot['id']} {snapshot['state']}"]
+    if snapshot["pid"] is not None:
+        parts.append(f"pid {snapshot['pid']}")
+    parts.append(str(snapshot["command"]))
+    details = []
+    if snapshot["ready_latency"] is not None:
+        details.append(f"готово за {snapshot['ready_latency'] * 1000:.0f} мс")
+    if snapshot["runtime"] is not None:
+        details.append(f"работало {snapshot['runtime']:.1f} с")
+    if snapshot["cpu_time"] is not None:
+        details.append(f"CPU {snapshot['cpu_time']:.2f} с")
+    if snapshot["error"]:
+        details.append(snapshot["error"])
+    text = " ".join(parts)
+    return f"{text}: {', '.join(details)}" if details else text
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    """Значение заданного перцентиля по отсортированному списку."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class ProcessLauncher:
+    """
+    Запускает приложения в фоновом потоке с циклом asyncio и собирает
+    завершившиеся процессы, чтобы они не оставались зомби.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_LAUNCHES,
+                 ready_timeout: float = READY_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.ready_timeout = ready_timeout
+        # Незавершённые запуски; записи удаляются при переходе в FINISHED_STATES
+        self.active: dict[int, LaunchRecord] = {}
+        self.states = {state: 0 for state in STATES}
+        self.launch_latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.ready_latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        # Снимки изменившихся записей для интерфейса; без окна их никто
+        # не забирает, поэтому очередь ограничена
+        self.events: queue.Queue = queue.Queue(maxsize=MAX_EVENTS)
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.reapers: set[asyncio.Task] = set()
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.thread = threading.Thread(target=self.loop.run_forever, name="launcher", daemon=True)
+        self.thread.start()
+
+    def launch(self, command, ready_check=None, requested_at: float | None = None):
+        """
+        Ставит запуск в очередь и сразу возвращает управление.
+
+        :param command: Путь к приложению или список аргументов для Popen.
+        :param ready_check: Необязательная функция pid -> bool, которая
+            сообщает, что приложение готово; без неё готовность — создание процесса.
+        :param requested_at: Момент запроса по monotonic(), если он был раньше
+            вызова (например, нажатие клавиши); от него считаются задержки.
+        :return: concurrent.futures.Future с LaunchRecord, завершается
+            при готовности приложения или ошибке запуска.
+        """
+        with self.lock:
+            self.next_id += 1
+            record = LaunchRecord(self.next_id, command, requested_at)
+            self.active[record.id] = record
+            self.states[QUEUED] += 1
+        self.publish(record)
+        return asyncio.run_coroutine_threadsafe(self.run(record, ready_check), self.loop)
+
+    def launch_many(self, commands, ready_check=None) -> list:
+        """Запускает несколько приложений; см. launch."""
+        return [self.launch(command, ready_check) for command in commands]
+
+    def publish(self, record: LaunchRecord) -> None:
+        """Отправляет снимок записи в очередь событий, вытесняя самый старый при переполнении."""
+        snapshot = record.snapshot()
+        while True:
+            try:
+                self.events.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def set_state(self, record: LaunchRecord, state: str) -> None:
+        """Переводит запись в новое состояние, обновляет счётчики и публикует снимок."""
+        with self.lock:
+            self.states[record.state] -= 1
+            self.states[state] += 1
+            record.state = state
+            if state in FINISHED_STATES:
+                self.active.pop(record.id, None)
+        self.publish(record)
+
+    async def run(self, record: LaunchRecord, ready_check) -> LaunchRecord:
+        """Запускает процесс в пределах лимита и ждёт его готовности."""
+        async with self.semaphore:
+            record.admitted_at = monotonic()
+            self.set_state(record, STARTING)
+            try:
+                # fork/exec занимает миллисекунды; в исполнителе запуски идут параллельно
+                process = await self.loop.run_in_executor(None, subprocess.Popen, record.command)
+            except Exception as error:
+                record.error = f"Ошибка при запуске приложения: {error}"
+                record.exited_at = monotonic()
+                self.set_state(record, FAILED)
+                return record
+            record.pid = process.pid
+            record.started_at = monotonic()
+            with self.lock:
+                self.launch_latencies.append(record.started_at - record.requested_at)
+            reaper = self.loop.create_task(self.reap(record, process))
+            self.reapers.add(reaper)
+            reaper.add_done_callback(self.reapers.discard)
+            # Слот освобождается, когда приложение готово; сборка идёт дальше
+            await self.wait_ready(record, ready_check, reaper)
+        return record
+
+    async def wait_ready(self, record: LaunchRecord, ready_check, reaper: asyncio.Task) -> None:
+        """
+        Проверяет готовность, пока процесс жив и не истёк ready_timeout.
+        Процесс, не ставший готовым за это время, переходит в UNRESPONSIVE.
+        """
+        deadline = record.started_at + self.ready_timeout
+        while ready_check is not None and not reaper.done():
+            if await self.loop.run_in_executor(None, ready_check, record.pid):
+                break
+            if monotonic() >= deadline:
+                record.error = f"Не готово за {self.ready_timeout:g} с"
+                break
+            await asyncio.wait({reaper}, timeout=READY_POLL_INTERVAL)
+        if reaper.done():
+            return
+        if record.error is not None:
+            self.set_state(record, UNRESPONSIVE)
+            return
+        record.ready_at = monotonic()
+        with self.lock:
+            self.ready_latencies.append(record.ready_at - record.requested_at)
+        self.set_state(record, RUNNING)
+
+    async def reap(self, record: LaunchRecord, process: subprocess.Popen) -> None:
+        """Дожидается завершения процесса и сохраняет код возврата и ресурсы."""
+        returncode, usage = await self.wait_child(process)
+        # Процесс уже собран здесь; Popen не должен ждать его повторно
+        process.returncode = returncode
+        record.returncode = returncode
+        record.exited_at = monotonic()
+        if usage is not None:
+            record.cpu_time = usage.ru_utime + usage.ru_stime
+            record.max_rss = usage.ru_maxrss
+        if returncode:
+            record.error = record.error or f"Код возврата {returncode}"
+            self.set_state(record, FAILED)
+        else:
+            self.set_state(record, EXITED)
+
+    async def wait_child(self, process: subprocess.Popen) -> tuple:
+        """
+        Ждёт завершения процесса, не блокируя цикл.
+
+        На Linux — через pidfd в самом цикле, на других POSIX — os.wait4
+        в отдельном потоке; в обоих случаях с rusage. В Windows ресурсы
+        недоступны.
+
+        :return: Код возврата и rusage или None.
+        """
+        pid = process.pid
+        if hasattr(os, "pidfd_open"):
+            try:
+                descriptor = os.pidfd_open(pid)
+            except OSError:
+                descriptor = None
+            if descriptor is not None:
+                exited = self.loop.create_future()
+                self.loop.add_reader(descriptor, lambda: exited.done() or exited.set_result(None))
+                try:
+                    await exited
+                finally:
+                    self.loop.remove_reader(descriptor)
+                    os.close(descriptor)
+                _, status, usage = os.wait4(pid, 0)
+                return os.waitstatus_to_exitcode(status), usage
+        if hasattr(os, "wait4"):
+            _, status, usage = await self.in_thread(os.wait4, pid, 0)
+            return os.waitstatus_to_exitcode(status), usage
+        return await self.in_thread(process.wait), None
+
+    def in_thread(self, function, *args) -> asyncio.Future:
+        """
+        Выполняет блокирующее ожидание в отдельном потоке: приложения живут
+        долго и заняли бы все потоки исполнителя по умолчанию.
+        """
+        future = self.loop.create_future()
+
+        def target():
+            try:
+                result = function(*args)
+            except Exception as error:
+                self.loop.call_soon_threadsafe(future.set_exception, error)
+            else:
+                self.loop.call_soon_threadsafe(future.set_result, result)
+
+        threading.Thread(target=target, name="launcher-wait", daemon=True).start()
+        return future
+
+    def stats(self) -> dict:
+        """
+        Возвращает число запусков по состояниям и перцентили задержек запуска
+        и готовности по последним LATENCY_SAMPLES замерам.
+        """
+        with self.lock:
+            launch_count, active = self.next_id, len(self.active)
+            states = dict(self.states)
+            launches = list(self.launch_latencies)
+            latencies = list(self.ready_latencies)
+        launches.sort()
+        latencies.sort()
+        return {
+            "launches": launch_count,
+            "active": active,
+            "states": states,
+            "launch_latency_p50": percentile(launches, 0.5),
+            "launch_latency_p95": percentile(launches, 0.95),
+            "ready_latency_p50": percentile(latencies, 0.5),
+            "ready_latency_p95": percentile(latencies, 0.95),
+            "ready_latency_max": latencies[-1] if latencies else None,
+        }
+
+    def shutdown(self, timeout: float = 1.0) -> None:
+        """Останавливает цикл; запущенные приложения продолжают работать."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+
+def benchmark(launches: int, limit: int, command: list[str]) -> None:
+    """
+    Запускает много коротких процессов и печатает задержки и ресурсы.
+
+    :param launches: Число запусков.
+    :param limit: Ограничение одновременных запусков.
+    :param command: Команда для запуска.
+    """
+    import time
+
+    launcher = ProcessLauncher(max_concurrent=limit)
+    started = time.perf_counter()
+    futures = launcher.launch_many([command] * launches)
+    for future in futures:
+        future.result()
+    while launcher.stats()["active"]:
+        time.sleep(0.01)
+    elapsed_time = time.perf_counter() - started
+    stats = launcher.stats()
+    launcher.shutdown()
+    # Итоговые снимки завершившихся запусков (последние MAX_EVENTS событий)
+    # есть только в очереди событий
+    snapshots = []
+    while not launcher.events.empty():
+        snapshot = launcher.events.get_nowait()
+        if snapshot["state"] in FINISHED_STATES:
+            snapshots.append(snapshot)
+
+    print(f"{launches} запусков, до {limit} одновременно: {elapsed_time:.2f} с, "
+          f"{launches / elapsed_time:.1f} запусков/с")
+    print(f"готовность: p50 {stats['ready_latency_p50'] * 1000:.1f} мс, "
+          f"p95 {stats['ready_latency_p95'] * 1000:.1f} мс, "
+          f"max {stats['ready_latency_max'] * 1000:.1f} мс")
+    print(f"состояния: {stats['states']}")
+    cpu = [s["cpu_time"] for s in snapshots if s["cpu_time"] is not None]
+    if cpu:
+        print(f"CPU на процесс: {sum(cpu) / len(cpu) * 1000:.1f} мс, "
+              f"пиковая память: {max(s['max_rss'] for s in snapshots)} КиБ")
+
+
+if __name__ == "__main__":
+    import argparse
+    import shlex
+    import sys
+
+    parser = argparse.ArgumentParser(description="Бенчмарк ядра запуска приложений")
+    parser.add_argument("--bench", type=int, metavar="LAUNCHES", default=100)
+    parser.add_argument("--limit", type=int, default=MAX_CONCURRENT_LAUNCHES)
+    parser.add_argument("--command", default=f'"{sys.executable}" -c pass',
+                        help="команда для запуска")
+    args = parser.parse_args()
+    benchmark(args.bench, args.limit, shlex.split(args.command))
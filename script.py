@@ -1,30 +1,903 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import sqlite3
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
 import httpx
-from datetime import datetime, timedelta
 
-app = FastAPI()
+from weather_metrics import MetricsMiddleware, MetricsRegistry
+from weather_resilience import CircuitBreaker, TokenBucket
+from weather_storage import CityStorage, create_storage
+
+logger = logging.getLogger(__name__)
+
+# Адрес внешнего API погоды (можно подменить на локальную заглушку)
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
+# Настройки пула HTTP-соединений к внешнему API
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+# HTTP/2 включается явно и требует установленного пакета h2 (httpx[http2])
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "0") == "1"
 
-# Хранение данных о городах и пользователях
-cities_data = {}
-user_cities = {}
+# Защита внешнего API: частота запросов, повторы и автоматический выключатель
+UPSTREAM_RATE = float(os.getenv("UPSTREAM_RATE", "50"))
+UPSTREAM_BURST = float(os.getenv("UPSTREAM_BURST", "100"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_SECONDS", "0.2"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Коды ответа, при которых запрос повторяется и считается сбоем API
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Настройки кэша ответов о погоде
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Точность округления координат в ключе кэша (2 знака — около 1 км)
+CACHE_COORD_PRECISION = int(os.getenv("CACHE_COORD_PRECISION", "2"))
+# Сколько секунд после устаревания отдавать запись сразу, обновляя её в фоне
+STALE_WHILE_REVALIDATE_SECONDS = float(os.getenv("STALE_WHILE_REVALIDATE_SECONDS", "60"))
+# Сколько секунд после устаревания отдавать запись, если API недоступно
+STALE_IF_ERROR_SECONDS = float(os.getenv("STALE_IF_ERROR_SECONDS", "3600"))
+
+# Хранение данных о городах и пользователях: memory или sqlite
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
+STORAGE_PATH = os.getenv("STORAGE_PATH", "weather.db")
+storage: CityStorage = create_storage(STORAGE_BACKEND, STORAGE_PATH)
 update_interval = timedelta(minutes=15)
 
+# Настройки запуска: при WORKERS > 1 кэш погоды и города хранятся в общем
+# файле SQLite, чтобы процессы не дублировали запросы к API
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Кэш погоды: memory (в процессе) или sqlite (общий для процессов)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_PATH = os.getenv("CACHE_PATH", STORAGE_PATH)
+
+# Настройки фонового обновления отслеживаемых городов
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "1") == "1"
+# За сколько секунд до истечения update_interval обновлять данные
+REFRESH_AHEAD_SECONDS = float(os.getenv("REFRESH_AHEAD_SECONDS", "60"))
+# Максимальный случайный сдвиг момента обновления, чтобы города не обновлялись разом
+REFRESH_JITTER_SECONDS = float(os.getenv("REFRESH_JITTER_SECONDS", "30"))
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "20"))
+# Не более стольких запросов к API в секунду со стороны фонового обновления
+REFRESH_RATE = float(os.getenv("REFRESH_RATE", "10"))
+REFRESH_POLL_SECONDS = float(os.getenv("REFRESH_POLL_SECONDS", "5"))
+
+# Метрики и профилирование запросов
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Профилирование включается переменной PROFILING_ENABLED и заголовком запроса PROFILE_HEADER
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_DIR = os.getenv("PROFILE_DIR", tempfile.gettempdir())
+# Сохранять профили только запросов не быстрее этого порога, в секундах
+PROFILE_SLOW_SECONDS = float(os.getenv("PROFILE_SLOW_SECONDS", "0"))
+
+# Настройки пакетных запросов погоды
+# Сколько координат передавать в одном запросе к API
+BATCH_MAX_LOCATIONS = int(os.getenv("BATCH_MAX_LOCATIONS", "50"))
+# Сколько одиночных запросов выполнять одновременно, если пакетный запрос не удался
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "10"))
+
+# Почасовой прогноз, загружаемый вместе с текущей погодой
+HOURLY_FORECAST_DAYS = int(os.getenv("HOURLY_FORECAST_DAYS", "7"))
+HOURLY_PAST_DAYS = int(os.getenv("HOURLY_PAST_DAYS", "1"))
+# Имена параметров для клиентов -> переменные почасового прогноза Open-Meteo
+HOURLY_PARAMETERS = {
+    "temperature": "temperature_2m",
+    "windspeed": "windspeed_10m",
+    "winddirection": "winddirection_10m",
+    "weathercode": "weathercode",
+    "pressure": "pressure_msl",
+    "humidity": "relativehumidity_2m",
+}
+# Общие параметры запроса к API: текущая погода и почасовой прогноз
+FORECAST_PARAMS = {
+    "current_weather": "true",
+    "hourly": ",".join(HOURLY_PARAMETERS.values()),
+    "forecast_days": HOURLY_FORECAST_DAYS,
+    "past_days": HOURLY_PAST_DAYS,
+}
+
+
+class Coordinates(BaseModel):
+    """Координаты точки для пакетного запроса погоды."""
+
+    lat: float
+    lon: float
+
+
+class CityRecord(BaseModel):
+    """Город пользователя для пакетного импорта."""
+
+    city_name: str
+    lat: float
+    lon: float
+    user_id: int
+
+
+class WeatherCache:
+    """Кэш ответов о погоде с ограничением времени жизни и вытеснением LRU."""
+
+    def __init__(self, ttl: timedelta, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict[tuple[float, float], tuple[datetime, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    @staticmethod
+    def make_key(lat: float, lon: float) -> tuple[float, float]:
+        """
+        Строит ключ кэша из округлённых координат.
+
+        :param lat: Широта.
+        :param lon: Долгота.
+        :return: Ключ кэша.
+        """
+        return round(lat, CACHE_COORD_PRECISION), round(lon, CACHE_COORD_PRECISION)
+
+    def get(self, key: tuple[float, float]) -> tuple[datetime, dict] | None:
+        """
+        Возвращает свежую запись (время получения, данные) или None.
+
+        :param key: Ключ кэша.
+        :return: Запись кэша или None, если её нет или она устарела.
+        """
+        entry = self.lookup(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def lookup(self, key: tuple[float, float]) -> tuple[datetime, dict] | None:
+        """
+        Ищет свежую запись, не изменяя счётчики.
+
+        :param key: Ключ кэша.
+        :return: Запись кэша или None, если её нет или она устарела.
+        """
+        entry = self.entries.get(key)
+        if entry is None or datetime.now() - entry[0] > self.ttl:
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def get_stale(self, key: tuple[float, float], max_stale: float) -> tuple[datetime, dict] | None:
+        """
+        Возвращает устаревшую запись, если она устарела не более чем на max_stale секунд.
+
+        :param key: Ключ кэша.
+        :param max_stale: Допустимое время после устаревания, в секундах.
+        :return: Запись кэша или None.
+        """
+        entry = self.entries.get(key)
+        if entry is None or datetime.now() - entry[0] > self.ttl + timedelta(seconds=max_stale):
+            return None
+        self.stale_hits += 1
+        return entry
+
+    def put(self, key: tuple[float, float], data: dict,
+            fetched_at: datetime | None = None) -> tuple[datetime, dict]:
+        """
+        Сохраняет данные, вытесняя самые давно использованные записи.
+
+        :param key: Ключ кэша.
+        :param data: Данные о погоде.
+        :param fetched_at: Время получения данных (по умолчанию сейчас).
+        :return: Сохранённая запись.
+        """
+        entry = (fetched_at or datetime.now(), data)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def stats(self) -> dict:
+        """Возвращает счётчики попаданий, промахов и вытеснений."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
 
-async def fetch_weather_data(lat: float, lon: float) -> dict:
+
+class SharedWeatherCache(WeatherCache):
+    """
+    Кэш погоды, общий для нескольких процессов: записи хранятся в SQLite,
+    а в памяти процесса остаётся локальная копия для быстрых попаданий.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS weather_cache (
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            fetched_at REAL NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (lat, lon)
+        );
+        CREATE INDEX IF NOT EXISTS weather_cache_fetched_at ON weather_cache (fetched_at);
+    """
+
+    def __init__(self, ttl: timedelta, max_entries: int, path: str):
+        super().__init__(ttl, max_entries)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA busy_timeout=5000")
+        self.connection.executescript(self.SCHEMA)
+
+    def lookup(self, key: tuple[float, float]) -> tuple[datetime, dict] | None:
+        entry = super().lookup(key)
+        if entry is not None:
+            return entry
+        entry = self.load(key, self.ttl)
+        return None if entry is None else super().lookup(key)
+
+    def get_stale(self, key: tuple[float, float], max_stale: float) -> tuple[datetime, dict] | None:
+        self.load(key, self.ttl + timedelta(seconds=max_stale))
+        return super().get_stale(key, max_stale)
+
+    def load(self, key: tuple[float, float], max_age: timedelta) -> tuple[datetime, dict] | None:
+        """
+        Загружает запись не старше max_age, сохранённую любым процессом,
+        если она новее локальной копии.
+
+        :param key: Ключ кэша.
+        :param max_age: Максимальный возраст записи.
+        :return: Загруженная запись или None.
+        """
+        local = self.entries.get(key)
+        newer_than = max(datetime.now() - max_age, local[0]) if local else datetime.now() - max_age
+        row = self.connection.execute(
+            "SELECT fetched_at, data FROM weather_cache WHERE lat = ? AND lon = ? AND fetched_at > ?",
+            (*key, newer_than.timestamp()),
+        ).fetchone()
+        if row is None:
+            return None
+        return super().put(key, self.decode(row[1]), datetime.fromtimestamp(row[0]))
+
+    def put(self, key: tuple[float, float], data: dict,
+            fetched_at: datetime | None = None) -> tuple[datetime, dict]:
+        entry = super().put(key, data, fetched_at)
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO weather_cache (lat, lon, fetched_at, data) VALUES (?, ?, ?, ?)",
+                (*key, entry[0].timestamp(), self.encode(data)),
+            )
+            self.connection.execute(
+                "DELETE FROM weather_cache WHERE fetched_at < ?",
+                ((entry[0] - self.ttl - timedelta(seconds=STALE_IF_ERROR_SECONDS)).timestamp(),),
+            )
+        return entry
+
+    @staticmethod
+    def encode(data: dict) -> str:
+        """Сериализует ответ API, сохраняя почасовой прогноз в колоночном виде."""
+        return json.dumps(data, default=lambda value: value.to_json())
+
+    @staticmethod
+    def decode(text: str) -> dict:
+        """Восстанавливает ответ API, сохранённый методом encode."""
+        data = json.loads(text)
+        if "hourly" in data:
+            data["hourly"] = HourlySeries.from_json(data["hourly"])
+        return data
+
+
+class RefreshLease:
+    """
+    Аренда роли ведущего процесса через SQLite: фоновое обновление
+    выполняет только тот процесс, который держит аренду.
+    """
+
+    def __init__(self, path: str, duration: float):
+        self.duration = duration
+        self.owner = str(os.getpid())
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA busy_timeout=5000")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    def acquire(self) -> bool:
+        """
+        Захватывает или продлевает аренду, если она свободна, истекла или уже наша.
+
+        :return: True, если процесс ведущий.
+        """
+        now = datetime.now().timestamp()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            row = self.connection.execute("SELECT owner, expires FROM leases WHERE name = 'refresh'").fetchone()
+            if row is not None and row[0] != self.owner and row[1] > now:
+                return False
+            self.connection.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires) VALUES ('refresh', ?, ?)",
+                (self.owner, now + self.duration),
+            )
+        return True
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом в один."""
+
+    def __init__(self):
+        self.in_flight: dict[tuple, asyncio.Task] = {}
+
+    async def run(self, key: tuple, factory):
+        """
+        Выполняет factory() один раз для всех одновременных вызовов с ключом key.
+
+        Ошибка общего вызова передаётся всем ожидающим, а отмена одного
+        ожидающего не прерывает вызов для остальных.
+
+        :param key: Ключ объединения.
+        :param factory: Функция без аргументов, возвращающая корутину.
+        :return: Результат общего вызова.
+        """
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def run_many(self, keys: list[tuple], factory) -> dict[tuple, object]:
+        """
+        Выполняет один общий вызов factory(keys) для ключей, которые ещё
+        не выполняются. Для каждого ключа регистрируется своя задача, поэтому
+        одновременные run() и run_many() с этими ключами ждут общий вызов.
+
+        :param keys: Ключи объединения.
+        :param factory: Функция от списка ключей, возвращающая корутину
+            со списком результатов в порядке ключей.
+        :return: Ключ -> результат или исключение для ключей, выполненных этим вызовом.
+        """
+        keys = [key for key in dict.fromkeys(keys) if key not in self.in_flight]
+        if not keys:
+            return {}
+        batch = asyncio.ensure_future(factory(keys))
+
+        async def pick(index: int):
+            return (await batch)[index]
+
+        tasks = {}
+        for index, key in enumerate(keys):
+            task = asyncio.ensure_future(pick(index))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _, key=key: self.in_flight.pop(key, None))
+            tasks[key] = task
+        results = await asyncio.gather(*(asyncio.shield(task) for task in tasks.values()),
+                                       return_exceptions=True)
+        return dict(zip(tasks, results))
+
+
+class HourlySeries:
+    """
+    Почасовой прогноз в колоночном виде: отметки времени и значения
+    каждого параметра хранятся в компактных массивах array('d').
+    """
+
+    __slots__ = ("times", "columns")
+
+    def __init__(self, hourly: dict):
+        self.times = array("d", (parse_timestamp(value) for value in hourly.get("time", ())))
+        self.columns = {
+            name: array("d", (math.nan if value is None else value for value in values))
+            for name, values in hourly.items()
+            if name != "time"
+        }
+
+    def to_json(self) -> dict:
+        """Возвращает прогноз в виде, пригодном для JSON."""
+        return {"times": self.times.tolist(),
+                "columns": {name: column.tolist() for name, column in self.columns.items()}}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "HourlySeries":
+        """
+        Восстанавливает прогноз, сохранённый методом to_json.
+
+        :param data: Результат to_json.
+        :return: Почасовой прогноз.
+        """
+        series = cls.__new__(cls)
+        series.times = array("d", data["times"])
+        series.columns = {name: array("d", column) for name, column in data["columns"].items()}
+        return series
+
+    def covers(self, timestamp: float) -> bool:
+        """Проверяет, попадает ли момент времени в диапазон прогноза."""
+        return bool(self.times) and self.times[0] <= timestamp <= self.times[-1]
+
+    def value_at(self, name: str, timestamp: float, interpolate: bool = False) -> float | None:
+        """
+        Находит значение параметра в момент времени двоичным поиском.
+
+        :param name: Переменная прогноза Open-Meteo.
+        :param timestamp: Момент времени (секунды POSIX, UTC).
+        :param interpolate: Интерполировать линейно между соседними часами
+                            вместо выбора ближайшего часа.
+        :return: Значение или None, если данных нет.
+        """
+        column = self.columns.get(name)
+        if column is None or not self.covers(timestamp):
+            return None
+        index = bisect_left(self.times, timestamp)
+        if self.times[index] == timestamp:
+            value = column[index]
+        else:
+            before, after = self.times[index - 1], self.times[index]
+            if interpolate:
+                weight = (timestamp - before) / (after - before)
+                value = column[index - 1] + (column[index] - column[index - 1]) * weight
+            else:
+                value = column[index] if after - timestamp <= timestamp - before else column[index - 1]
+        return None if math.isnan(value) else value
+
+
+def parse_timestamp(value: str) -> float:
+    """
+    Переводит время в формате ISO в секунды POSIX; время без часового пояса
+    считается UTC, как в ответах Open-Meteo.
+
+    :param value: Время в формате ISO.
+    :return: Секунды POSIX.
+    """
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def create_weather_cache() -> WeatherCache:
+    """
+    Создаёт кэш погоды согласно CACHE_BACKEND.
+
+    :return: Кэш погоды.
+    :raises ValueError: Если тип кэша неизвестен.
+    """
+    if CACHE_BACKEND == "memory":
+        return WeatherCache(update_interval, CACHE_MAX_ENTRIES)
+    if CACHE_BACKEND == "sqlite":
+        return SharedWeatherCache(update_interval, CACHE_MAX_ENTRIES, CACHE_PATH)
+    raise ValueError(f"Unknown cache backend: {CACHE_BACKEND}")
+
+
+weather_cache = create_weather_cache()
+weather_flights = SingleFlight()
+upstream_limiter = TokenBucket(UPSTREAM_RATE, UPSTREAM_BURST)
+upstream_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+upstream_latency = metrics.histogram(
+    "weather_upstream_request_duration_seconds", "Open-Meteo request latency", ("outcome",))
+upstream_errors = metrics.counter("weather_upstream_errors_total", "Failed Open-Meteo requests", ("status",))
+metrics.gauge("weather_cache_entries", "Weather cache entries", callback=lambda: len(weather_cache.entries))
+metrics.counter("weather_cache_hits_total", "Weather cache hits", callback=lambda: weather_cache.hits)
+metrics.counter("weather_cache_misses_total", "Weather cache misses", callback=lambda: weather_cache.misses)
+metrics.counter("weather_cache_stale_hits_total", "Stale weather served",
+                callback=lambda: weather_cache.stale_hits)
+metrics.counter("weather_cache_evictions_total", "Weather cache evictions",
+                callback=lambda: weather_cache.evictions)
+metrics.gauge("weather_cache_hit_ratio", "Weather cache hit ratio",
+              callback=lambda: weather_cache.stats()["hit_ratio"])
+metrics.gauge("weather_upstream_breaker_open", "1 if the Open-Meteo circuit breaker is not closed",
+              callback=lambda: upstream_breaker.state != upstream_breaker.CLOSED)
+# С общим кэшем обновлять города должен только один процесс
+refresh_lease = (
+    RefreshLease(CACHE_PATH, max(3 * REFRESH_POLL_SECONDS, 30.0)) if CACHE_BACKEND == "sqlite" else None
+)
+
+# Общий HTTP-клиент на всё время жизни приложения
+http_client: httpx.AsyncClient | None = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Создаёт HTTP-клиент с пулом keep-alive соединений.
+
+    :return: Настроенный асинхронный HTTP-клиент.
+    """
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT, http2=HTTP2_ENABLED)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Возвращает общий HTTP-клиент, создавая его при первом обращении.
+
+    :return: Общий асинхронный HTTP-клиент.
+    """
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Открывает общий HTTP-клиент и запускает фоновое обновление при старте
+    приложения, останавливает их при завершении.
+
+    :param app: Экземпляр приложения.
+    """
+    global http_client
+    get_http_client()
+    refresher = asyncio.create_task(refresh_loop()) if REFRESH_ENABLED else None
+    try:
+        yield
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+            await asyncio.gather(refresher, return_exceptions=True)
+        if http_client is not None:
+            await http_client.aclose()
+            http_client = None
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    MetricsMiddleware,
+    registry=metrics,
+    profile_header=PROFILE_HEADER if PROFILING_ENABLED else "",
+    profile_dir=PROFILE_DIR,
+    profile_slow_seconds=PROFILE_SLOW_SECONDS,
+)
+
+
+async def fetch_weather_data(lat: float, lon: float, timeout: float | None = None) -> dict:
     """
     Получает данные о погоде для заданных координат.
 
     :param lat: Широта города.
     :param lon: Долгота города.
-    :return: Данные о текущей погоде.
+    :param timeout: Таймаут запроса в секундах (по умолчанию HTTP_TIMEOUT).
+    :return: Данные о текущей погоде и почасовой прогноз.
+    :raises HTTPException: Если не удалось получить данные о погоде.
+    """
+    params = {"latitude": lat, "longitude": lon, **FORECAST_PARAMS}
+    return await request_open_meteo(params, timeout)
+
+
+async def fetch_weather_data_many(coordinates: list[tuple[float, float]],
+                                  timeout: float | None = None) -> list[dict]:
+    """
+    Получает данные о погоде для нескольких точек одним запросом к API.
+
+    :param coordinates: Список пар (широта, долгота).
+    :param timeout: Таймаут запроса в секундах (по умолчанию HTTP_TIMEOUT).
+    :return: Данные о текущей погоде в порядке координат.
+    :raises HTTPException: Если не удалось получить данные о погоде.
+    """
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in coordinates),
+        "longitude": ",".join(str(lon) for _, lon in coordinates),
+        **FORECAST_PARAMS,
+    }
+    data = await request_open_meteo(params, timeout)
+    # Для одной точки API возвращает объект, для нескольких — список
+    results = data if isinstance(data, list) else [data]
+    if len(results) != len(coordinates):
+        raise HTTPException(status_code=502, detail="Unexpected batch response from weather service")
+    return results
+
+
+async def request_open_meteo(params: dict, timeout: float | None = None):
+    """
+    Выполняет запрос к API погоды с ограничением частоты, повторами
+    с экспоненциальной задержкой и автоматическим выключателем.
+
+    :param params: Параметры запроса.
+    :param timeout: Таймаут запроса в секундах (по умолчанию HTTP_TIMEOUT).
+    :return: Разобранный JSON-ответ.
+    :raises HTTPException: Если не удалось получить данные о погоде
+                           или выключатель разомкнут (503).
+    """
+    for attempt in range(UPSTREAM_RETRIES + 1):
+        if not upstream_breaker.allow():
+            raise HTTPException(status_code=503, detail="Weather service is unavailable")
+        await upstream_limiter.acquire()
+        try:
+            result = await send_open_meteo(params, timeout)
+        except HTTPException as error:
+            if error.status_code not in RETRYABLE_STATUS_CODES:
+                raise
+            upstream_breaker.record_failure()
+            if attempt == UPSTREAM_RETRIES:
+                raise
+            await asyncio.sleep(UPSTREAM_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5))
+        else:
+            upstream_breaker.record_success()
+            return result
+
+
+async def send_open_meteo(params: dict, timeout: float | None = None):
+    """
+    Выполняет один запрос к API погоды через общий HTTP-клиент.
+
+    :param params: Параметры запроса.
+    :param timeout: Таймаут запроса в секундах (по умолчанию HTTP_TIMEOUT).
+    :return: Разобранный JSON-ответ.
     :raises HTTPException: Если не удалось получить данные о погоде.
     """
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        if response.status_code == 200:
-            return response.json()
-        raise HTTPException(status_code=response.status_code, detail="Error fetching weather data")
+    started = perf_counter()
+    try:
+        response = await get_http_client().get(
+            OPEN_METEO_URL, params=params, timeout=HTTP_TIMEOUT if timeout is None else timeout
+        )
+    except httpx.TimeoutException:
+        upstream_latency.observe(perf_counter() - started, "timeout")
+        upstream_errors.inc("timeout")
+        raise HTTPException(status_code=504, detail="Weather service timed out")
+    except httpx.HTTPError:
+        upstream_latency.observe(perf_counter() - started, "error")
+        upstream_errors.inc("connection")
+        raise HTTPException(status_code=502, detail="Error fetching weather data")
+    if response.status_code == 200:
+        upstream_latency.observe(perf_counter() - started, "ok")
+        return response.json()
+    upstream_latency.observe(perf_counter() - started, "error")
+    upstream_errors.inc(response.status_code)
+    raise HTTPException(status_code=response.status_code, detail="Error fetching weather data")
+
+
+async def get_cached_weather(lat: float, lon: float) -> tuple[datetime, dict]:
+    """
+    Возвращает данные о погоде из кэша, обращаясь к API только при промахе.
+
+    :param lat: Широта города.
+    :param lon: Долгота города.
+    :return: Время получения данных и сами данные.
+    """
+    key = weather_cache.make_key(lat, lon)
+    entry = weather_cache.get(key)
+    if entry is not None:
+        return entry
+
+    # Недавно устаревшую запись отдаём сразу, обновляя её в фоне
+    entry = weather_cache.get_stale(key, STALE_WHILE_REVALIDATE_SECONDS)
+    if entry is not None:
+        revalidate_in_background(key, lat, lon)
+        return entry
+
+    try:
+        # Одновременные промахи по одним координатам ждут один запрос к API
+        return await weather_flights.run(key, lambda: refresh_weather(key, lat, lon))
+    except HTTPException as error:
+        return stale_or_raise(key, error)
+
+
+def stale_or_raise(key: tuple[float, float], error: HTTPException) -> tuple[datetime, dict]:
+    """
+    Возвращает последние полученные данные, если API недоступно.
+
+    :param key: Ключ кэша.
+    :param error: Ошибка запроса к API.
+    :return: Устаревшая запись кэша.
+    :raises HTTPException: Если подходящей записи нет.
+    """
+    entry = weather_cache.get_stale(key, STALE_IF_ERROR_SECONDS)
+    if entry is None:
+        raise error
+    return entry
+
+
+def revalidate_in_background(key: tuple[float, float], lat: float, lon: float) -> None:
+    """
+    Запускает фоновое обновление записи кэша; ошибки обновления игнорируются.
+
+    :param key: Ключ кэша.
+    :param lat: Широта города.
+    :param lon: Долгота города.
+    """
+    task = asyncio.ensure_future(weather_flights.run(key, lambda: refresh_weather(key, lat, lon)))
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+async def refresh_weather(key: tuple[float, float], lat: float, lon: float) -> tuple[datetime, dict]:
+    """
+    Загружает данные о погоде из API и сохраняет их в кэш.
+
+    :param key: Ключ кэша.
+    :param lat: Широта города.
+    :param lon: Долгота города.
+    :return: Сохранённая запись кэша.
+    """
+    return store_weather(key, await fetch_weather_data(lat, lon))
+
+
+def store_weather(key: tuple[float, float], weather_data: dict) -> tuple[datetime, dict]:
+    """
+    Сохраняет ответ API в кэш, заменяя почасовой прогноз колоночным HourlySeries.
+
+    :param key: Ключ кэша.
+    :param weather_data: Ответ API погоды.
+    :return: Сохранённая запись кэша.
+    """
+    if "hourly" in weather_data:
+        weather_data["hourly"] = HourlySeries(weather_data["hourly"])
+    return weather_cache.put(key, weather_data)
+
+
+async def get_cached_weather_many(coordinates: list[tuple[float, float]]) -> list:
+    """
+    Возвращает данные о погоде для многих точек, загружая промахи кэша
+    пакетными запросами по BATCH_MAX_LOCATIONS координат. Если пакетный
+    запрос не удался, его точки загружаются по одной, не более
+    BATCH_CONCURRENCY одновременно.
+
+    :param coordinates: Список пар (широта, долгота).
+    :return: Для каждой точки запись кэша (время, данные) или HTTPException.
+    """
+    keys = [weather_cache.make_key(lat, lon) for lat, lon in coordinates]
+    results: dict[tuple[float, float], object] = {}
+    missing: dict[tuple[float, float], tuple[float, float]] = {}
+    for key, (lat, lon) in zip(keys, coordinates):
+        if key in results or key in missing:
+            continue
+        entry = weather_cache.get(key)
+        if entry is None:
+            missing[key] = (lat, lon)
+        else:
+            results[key] = entry
+
+    async def fetch_chunk(chunk: list[tuple[float, float]]) -> list[tuple[datetime, dict]]:
+        batch = await fetch_weather_data_many([missing[key] for key in chunk])
+        return [store_weather(key, weather_data) for key, weather_data in zip(chunk, batch)]
+
+    # Точки, которые уже загружаются другим запросом, ждём через SingleFlight;
+    # остальные регистрируются в нём, чтобы одновременные запросы ждали этот пакет
+    pending = [key for key in missing if key not in weather_flights.in_flight]
+    for start in range(0, len(pending), BATCH_MAX_LOCATIONS):
+        chunk = pending[start:start + BATCH_MAX_LOCATIONS]
+        fetched = await weather_flights.run_many(chunk, fetch_chunk)
+        for key, result in fetched.items():
+            # Точки неудавшегося пакета загружаются ниже по одной
+            if not isinstance(result, BaseException):
+                results[key] = result
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def fetch_one(key: tuple[float, float]):
+        async with semaphore:
+            return await weather_flights.run(key, lambda: refresh_weather(key, *missing[key]))
+
+    leftover = [key for key in missing if key not in results]
+    fetched = await asyncio.gather(*(fetch_one(key) for key in leftover), return_exceptions=True)
+    for key, result in zip(leftover, fetched):
+        if isinstance(result, HTTPException):
+            result = weather_cache.get_stale(key, STALE_IF_ERROR_SECONDS) or result
+        results[key] = result
+    return [results[key] for key in keys]
+
+
+# Время следующего планового обновления для каждого ключа кэша
+refresh_schedule: dict[tuple[float, float], datetime] = {}
+# Будит фоновое обновление, когда добавлен новый город
+refresh_wakeup = asyncio.Event()
+
+
+async def tracked_locations() -> dict[tuple[float, float], list[tuple[float, float]]]:
+    """
+    Группирует координаты отслеживаемых городов по ключу кэша, чтобы города
+    разных пользователей с одними координатами обновлялись одним запросом.
+
+    Выборка всех координат из хранилища идёт в отдельном потоке: на больших
+    таблицах она занимает сотни миллисекунд и не должна останавливать цикл событий.
+
+    :return: Ключ кэша -> список координат городов.
+    """
+    locations: dict[tuple[float, float], list[tuple[float, float]]] = {}
+    for lat, lon in await asyncio.to_thread(storage.locations):
+        locations.setdefault(weather_cache.make_key(lat, lon), []).append((lat, lon))
+    return locations
+
+
+def schedule_refresh(key: tuple[float, float], fetched_at: datetime) -> None:
+    """
+    Планирует обновление незадолго до истечения update_interval со случайным сдвигом.
+
+    :param key: Ключ кэша.
+    :param fetched_at: Время получения текущих данных.
+    """
+    lead = REFRESH_AHEAD_SECONDS + random.uniform(0, REFRESH_JITTER_SECONDS)
+    refresh_schedule[key] = fetched_at + update_interval - timedelta(seconds=lead)
+
+
+async def refresh_due_cities() -> int:
+    """
+    Обновляет города, у которых подошло время обновления, пачками
+    по REFRESH_BATCH_SIZE и не быстрее REFRESH_RATE запросов в секунду.
+
+    :return: Число успешно обновлённых местоположений.
+    """
+    now = datetime.now()
+    locations = await tracked_locations()
+    for key in refresh_schedule.keys() - locations.keys():
+        del refresh_schedule[key]
+
+    due = []
+    for key, coordinates in locations.items():
+        if key not in refresh_schedule and key in weather_cache.entries:
+            schedule_refresh(key, weather_cache.entries[key][0])
+        if refresh_schedule.get(key, now) <= now:
+            due.append((key, coordinates))
+
+    refreshed = 0
+    for start in range(0, len(due), REFRESH_BATCH_SIZE):
+        batch = due[start:start + REFRESH_BATCH_SIZE]
+        results = await asyncio.gather(
+            *(
+                weather_flights.run(key, lambda key=key: refresh_weather(key, *key))
+                for key, _ in batch
+            ),
+            return_exceptions=True,
+        )
+        for (key, coordinates), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                # Повторим попытку на следующем проходе
+                continue
+            fetched_at, _ = result
+            schedule_refresh(key, fetched_at)
+            storage.touch(coordinates, fetched_at)
+            refreshed += 1
+        await asyncio.sleep(len(batch) / REFRESH_RATE)
+    return refreshed
+
+
+async def refresh_loop() -> None:
+    """
+    Фоновая задача: периодически обновляет данные отслеживаемых городов.
+    Ошибка прохода (например, занятая база SQLite) записывается в журнал,
+    и обновление повторяется на следующем интервале.
+    """
+    while True:
+        refresh_wakeup.clear()
+        try:
+            if refresh_lease is None or refresh_lease.acquire():
+                await refresh_due_cities()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background refresh failed, retrying in %s s", REFRESH_POLL_SECONDS)
+        try:
+            await asyncio.wait_for(refresh_wakeup.wait(), REFRESH_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
 
 
 @app.get("/weather")
@@ -36,7 +909,17 @@ async def get_weather(lat: float, lon: float):
     :param lon: Долгота города.
     :return: Данные о текущей погоде.
     """
-    weather_data = await fetch_weather_data(lat, lon)
+    _, weather_data = await get_cached_weather(lat, lon)
+    return summarize_weather(weather_data)
+
+
+def summarize_weather(weather_data: dict) -> dict:
+    """
+    Выбирает из ответа API основные показатели текущей погоды.
+
+    :param weather_data: Ответ API погоды.
+    :return: Температура, скорость ветра и давление.
+    """
     current_weather = weather_data['current_weather']
     return {
         "temperature": current_weather['temperature'],
@@ -45,6 +928,39 @@ async def get_weather(lat: float, lon: float):
     }
 
 
+def summarize_batch(coordinates: list[tuple[float, float]], entries: list) -> list[dict]:
+    """
+    Формирует ответ пакетного запроса в порядке координат.
+
+    :param coordinates: Список пар (широта, долгота).
+    :param entries: Результаты get_cached_weather_many.
+    :return: Погода либо описание ошибки для каждой точки.
+    """
+    response = []
+    for (lat, lon), entry in zip(coordinates, entries):
+        item = {"lat": lat, "lon": lon}
+        if isinstance(entry, HTTPException):
+            item["error"] = entry.detail
+        elif isinstance(entry, BaseException):
+            raise entry
+        else:
+            item.update(summarize_weather(entry[1]))
+        response.append(item)
+    return response
+
+
+@app.post("/weather/batch")
+async def get_weather_batch(coordinates: list[Coordinates]):
+    """
+    Возвращает текущую погоду для списка координат одним ответом.
+
+    :param coordinates: Список координат.
+    :return: Погода для каждой точки в порядке запроса.
+    """
+    points = [(point.lat, point.lon) for point in coordinates]
+    return summarize_batch(points, await get_cached_weather_many(points))
+
+
 @app.post("/add_city")
 async def add_city(city_name: str, lat: float, lon: float, user_id: int):
     """
@@ -56,11 +972,24 @@ async def add_city(city_name: str, lat: float, lon: float, user_id: int):
     :param user_id: Идентификатор пользователя.
     :return: Сообщение об успешном добавлении.
     """
-    user_cities.setdefault(user_id, []).append({"name": city_name, "lat": lat, "lon": lon})
-    cities_data[(city_name, user_id)] = {"lat": lat, "lon": lon, "last_updated": datetime.now()}
+    storage.add_city(city_name, lat, lon, user_id)
+    refresh_wakeup.set()
     return {"message": f"City {city_name} added for user {user_id}"}
 
 
+@app.post("/add_cities")
+async def add_cities(cities: list[CityRecord]):
+    """
+    Добавляет города пачкой (импорт).
+
+    :param cities: Список городов с пользователями.
+    :return: Число добавленных или обновлённых городов.
+    """
+    count = storage.add_cities((city.city_name, city.lat, city.lon, city.user_id) for city in cities)
+    refresh_wakeup.set()
+    return {"message": f"{count} cities added"}
+
+
 @app.get("/cities")
 async def get_cities(user_id: int):
     """
@@ -69,49 +998,107 @@ async def get_cities(user_id: int):
     :param user_id: Идентификатор пользователя.
     :return: Список городов.
     """
-    return user_cities.get(user_id, [])
+    return storage.get_user_cities(user_id)
+
+
+@app.get("/cities/weather")
+async def get_cities_weather(user_id: int):
+    """
+    Возвращает текущую погоду во всех городах пользователя.
+
+    :param user_id: Идентификатор пользователя.
+    :return: Погода для каждого города пользователя.
+    """
+    cities = storage.get_user_cities(user_id)
+    points = [(city["lat"], city["lon"]) for city in cities]
+    response = summarize_batch(points, await get_cached_weather_many(points))
+    for city, item in zip(cities, response):
+        item["name"] = city["name"]
+    return response
 
 
 @app.get("/weather_at_time")
-async def get_weather_at_time(city_name: str, time: str, user_id: int, parameters: str):
+async def get_weather_at_time(city_name: str, time: str, user_id: int, parameters: str,
+                              interpolate: bool = False):
     """
     Возвращает данные о погоде в заданный момент времени для указанного города.
 
+    Значения берутся из закэшированного почасового прогноза; если прогноза
+    нет, используется текущая погода.
+
     :param city_name: Название города.
-    :param time: Время в формате ISO.
+    :param time: Время в формате ISO (без часового пояса — UTC).
     :param user_id: Идентификатор пользователя.
     :param parameters: Запрашиваемые параметры погоды, разделенные запятыми.
+    :param interpolate: Интерполировать между часами прогноза.
     :return: Запрашиваемые данные о погоде.
-    :raises HTTPException: Если город не найден для пользователя.
+    :raises HTTPException: Если город не найден для пользователя
+                           или время вне диапазона прогноза.
     """
-    city_key = (city_name, user_id)
-    if city_key not in cities_data:
+    city_info = storage.get_city(city_name, user_id)
+    if city_info is None:
         raise HTTPException(status_code=404, detail="City not found for user")
 
-    city_info = cities_data[city_key]
     lat, lon = city_info['lat'], city_info['lon']
-    target_time = datetime.fromisoformat(time)
-    current_time = datetime.now()
+    try:
+        target_time = parse_timestamp(time)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Time must be in ISO format")
 
-    # Проверка необходимости обновления данных
-    if current_time - city_info['last_updated'] > update_interval:
-        weather_data = await fetch_weather_data(lat, lon)
-        cities_data[city_key]['last_updated'] = current_time
-    else:
-        weather_data = await fetch_weather_data(lat, lon)
+    # Данные обновляются из API не чаще, чем раз в update_interval
+    fetched_at, weather_data = await get_cached_weather(lat, lon)
+    if fetched_at != city_info['last_updated']:
+        storage.touch([(lat, lon)], fetched_at)
 
     # Возврат запрашиваемых параметров
     response = {}
-    current_weather = weather_data['current_weather']
+    series = weather_data.get('hourly')
+    if series is None:
+        current_weather = weather_data['current_weather']
+        for param in parameters.split(','):
+            if param in current_weather:
+                response[param] = current_weather[param]
+        return response
+
+    if not series.covers(target_time):
+        raise HTTPException(status_code=404, detail="Time is outside the forecast range")
     for param in parameters.split(','):
-        if param in current_weather:
-            response[param] = current_weather[param]
+        name = HOURLY_PARAMETERS.get(param, param)
+        if name in series.columns:
+            response[param] = series.value_at(name, target_time, interpolate)
 
     return response
 
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Возвращает статистику кэша погоды.
+
+    :return: Число записей, попаданий, промахов и вытеснений,
+             состояние выключателя внешнего API.
+    """
+    return {**weather_cache.stats(), "upstream_breaker": upstream_breaker.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Возвращает метрики сервиса в текстовом формате Prometheus.
+
+    :return: Метрики текущего процесса.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Запуск приложения
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    if WORKERS > 1:
+        if STORAGE_BACKEND != "sqlite" or CACHE_BACKEND != "sqlite":
+            raise SystemExit("WORKERS > 1 requires STORAGE_BACKEND=sqlite and CACHE_BACKEND=sqlite")
+        # Каждый процесс импортирует модуль заново и читает те же переменные окружения
+        uvicorn.run("script:app", host=HOST, port=PORT, workers=WORKERS)
+    else:
+        uvicorn.run(app, host=HOST, port=PORT)
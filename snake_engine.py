@@ -0,0 +1,297 @@
+"""
+Движок змейки без отображения: много независимых игр шагают одновременно
+на массивах NumPy. Используется the_snake.py для отрисовки одной игры
+и подходит для массовой самоигры и обучения.
+
+Бенчмарк: python snake_engine.py --bench --games 4096 --steps 1000
+Длинная змейка: python snake_engine.py --bench-length 200 --steps 2000
+"""
+import numpy as np
+
+# Направления в порядке номеров действий
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+
+# Номер противоположного направления: разворот на месте запрещён
+OPPOSITE = np.array([1, 0, 3, 2])
+DELTA_X = np.array([direction[0] for direction in DIRECTIONS])
+DELTA_Y = np.array([direction[1] for direction in DIRECTIONS])
+
+# Значения клеток в observe()
+EMPTY, BODY, HEAD, APPLE = 0, 1, 2, 3
+
+
+class SnakeEngine:
+    """
+    Набор игр на поле width x height с переходом через края.
+
+    Клетка задаётся номером y * width + x. Тело каждой игры хранится
+    в кольцевом буфере, занятость — в битовой карте, свободные клетки —
+    в списке с индексом, поэтому шаг и новое яблоко стоят O(1) на игру
+    при любой длине змейки.
+    """
+
+    def __init__(self, games=1, width=32, height=24, seed=None):
+        self.games = games
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.center = (height // 2) * width + width // 2
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.arange(games)
+
+        # Кольцевой буфер тела: хвост в start, голова в start + length - 1
+        self.body = np.zeros((games, self.cells), dtype=np.int32)
+        self.start = np.zeros(games, dtype=np.int64)
+        self.lengths = np.zeros(games, dtype=np.int64)
+        self.occupied = np.zeros((games, self.cells), dtype=bool)
+        # Первые free_count элементов free — свободные клетки,
+        # free_index[клетка] — позиция клетки в free
+        self.free = np.zeros((games, self.cells), dtype=np.int32)
+        self.free_index = np.zeros((games, self.cells), dtype=np.int32)
+        self.free_count = np.zeros(games, dtype=np.int64)
+
+        self.directions = np.zeros(games, dtype=np.int64)
+        self.growing = np.zeros(games, dtype=bool)
+        self.apples = np.full(games, -1, dtype=np.int64)
+        self.scores = np.zeros(games, dtype=np.int64)
+        # Клетка, освобождённая хвостом на последнем шаге, или -1
+        self.vacated = np.full(games, -1, dtype=np.int64)
+
+        self.reset()
+        self.directions[:] = DIRECTIONS.index(RIGHT)  # Первая игра — вправо
+
+    def reset(self, games=None):
+        """
+        Начать заново заданные игры: змейка длиной 1 в центре,
+        случайное направление и новое яблоко.
+
+        :param games: Номера игр; по умолчанию все.
+        """
+        games = self.rows if games is None else np.asarray(games)
+        if not len(games):
+            return
+        self.occupied[games] = False
+        self.free[games] = np.arange(self.cells)
+        self.free_index[games] = np.arange(self.cells)
+        self.free_count[games] = self.cells
+
+        centers = np.full(len(games), self.center)
+        self.body[games, 0] = self.center
+        self.start[games] = 0
+        self.lengths[games] = 1
+        self.occupied[games, centers] = True
+        self.take_free(games, centers)
+
+        self.directions[games] = self.rng.integers(
+            0, len(DIRECTIONS), len(games))
+        self.growing[games] = False
+        self.scores[games] = 0
+        self.spawn_apples(games)
+
+    def take_free(self, games, cells):
+        """Убрать клетки из списков свободных (по одной на игру)."""
+        positions = self.free_index[games, cells]
+        self.free_count[games] -= 1
+        # На место занятой клетки встаёт последняя свободная
+        last = self.free[games, self.free_count[games]]
+        self.free[games, positions] = last
+        self.free_index[games, last] = positions
+
+    def release_free(self, games, cells):
+        """Вернуть клетки в списки свободных (по одной на игру)."""
+        counts = self.free_count[games]
+        self.free[games, counts] = cells
+        self.free_index[games, cells] = counts
+        self.free_count[games] += 1
+
+    def spawn_apples(self, games):
+        """Поставить яблоки в свободные клетки; -1, если поле заполнено."""
+        counts = self.free_count[games]
+        picks = (self.rng.random(len(games)) * counts).astype(np.int64)
+        apples = self.free[games, np.minimum(picks, counts - 1)]
+        self.apples[games] = np.where(counts > 0, apples, -1)
+
+    @property
+    def heads(self):
+        """Клетки голов всех игр."""
+        last = self.start + self.lengths - 1
+        return self.body[self.rows, last % self.cells]
+
+    def step(self, actions=None):
+        """
+        Сделать один шаг во всех играх. Закончившиеся игры начинаются заново.
+
+        :param actions: Номера направлений из DIRECTIONS для каждой игры;
+            -1 или разворот назад — сохранить текущее направление.
+        :return: Награды (1 — яблоко, -1 — столкновение) и флаги конца игры.
+        """
+        rows = self.rows
+        if actions is not None:
+            actions = np.asarray(actions)
+            turn = (actions >= 0) & (actions != OPPOSITE[self.directions])
+            self.directions = np.where(turn, actions, self.directions)
+
+        heads = self.heads
+        x = (heads % self.width + DELTA_X[self.directions]) % self.width
+        y = (heads // self.width + DELTA_Y[self.directions]) % self.height
+        new_heads = y * self.width + x
+
+        # Хвост освобождается до проверки, поэтому в его клетку идти можно
+        moving = np.flatnonzero(~self.growing)
+        tails = self.body[moving, self.start[moving]]
+        self.occupied[moving, tails] = False
+        self.release_free(moving, tails)
+        self.start[moving] = (self.start[moving] + 1) % self.cells
+        self.lengths[moving] -= 1
+        self.growing[:] = False
+        self.vacated[:] = -1
+        self.vacated[moving] = tails
+
+        collided = self.occupied[rows, new_heads]
+        alive = np.flatnonzero(~collided)
+        alive_heads = new_heads[alive]
+        slots = (self.start[alive] + self.lengths[alive]) % self.cells
+        self.body[alive, slots] = alive_heads
+        self.lengths[alive] += 1
+        self.occupied[alive, alive_heads] = True
+        self.take_free(alive, alive_heads)
+
+        # Съеденное яблоко удлиняет змейку на следующем шаге
+        ate = ~collided & (new_heads == self.apples)
+        eaters = np.flatnonzero(ate)
+        self.growing[eaters] = True
+        self.scores[eaters] += 1
+        self.spawn_apples(eaters)
+
+        dones = collided | (self.free_count == 0)
+        rewards = ate.astype(np.float32) - collided
+        self.reset(np.flatnonzero(dones))
+        return rewards, dones
+
+    def body_cells(self, game=0):
+        """Клетки тела игры от головы к хвосту."""
+        order = (self.start[game] + np.arange(self.lengths[game])) % self.cells
+        return self.body[game, order[::-1]].tolist()
+
+    def observe(self):
+        """
+        Поля всех игр для обучения.
+
+        :return: Массив (games, height, width)
+            со значениями EMPTY, BODY, HEAD, APPLE.
+        """
+        grid = self.occupied.astype(np.int8)
+        grid[self.rows, self.heads] = HEAD
+        placed = np.flatnonzero(self.apples >= 0)
+        grid[placed, self.apples[placed]] = APPLE
+        return grid.reshape(self.games, self.height, self.width)
+
+
+def cycle_direction(cell, width, height):
+    """
+    Номер направления вдоль гамильтонова цикла поля (змейкой по строкам,
+    возврат по нулевому столбцу); height должна быть чётной.
+
+    :param cell: Клетка y * width + x.
+    :return: Номер направления из DIRECTIONS.
+    """
+    x, y = cell % width, cell // width
+    if x == 0:
+        direction = RIGHT if y == 0 else UP
+    elif y % 2 == 0:
+        direction = RIGHT if x < width - 1 else DOWN
+    elif x > 1 or y == height - 1:
+        direction = LEFT
+    else:
+        direction = DOWN
+    return DIRECTIONS.index(direction)
+
+
+def benchmark_length(size, steps, seed):
+    """
+    Измерить время шага одной игры при разной длине змейки: змейка
+    растёт вдоль гамильтонова цикла и поэтому никогда не врезается в себя.
+
+    :param size: Сторона квадратного поля (чётная).
+    :param steps: Число замеряемых шагов на каждой длине.
+    :param seed: Зерно генератора.
+    """
+    import time
+
+    engine = SnakeEngine(1, size, size, seed)
+    engine.directions[:] = cycle_direction(engine.center, size, size)
+    action = np.zeros(1, dtype=np.int64)
+    print(f'Поле {size}x{size}, мкс на шаг')
+    print(f'{"длина":>8} {"заполнение":>11} {"шаг":>9}')
+    for fill in (0.01, 0.1, 0.5, 0.9, 0.99):
+        while engine.lengths[0] < int(engine.cells * fill):
+            action[0] = cycle_direction(int(engine.heads[0]), size, size)
+            engine.growing[:] = True
+            engine.step(action)
+
+        length = engine.lengths[0]
+        reset = False
+        started = time.perf_counter()
+        for _ in range(steps):
+            action[0] = cycle_direction(int(engine.heads[0]), size, size)
+            _, dones = engine.step(action)
+            reset |= dones[0]
+            # Съеденное яблоко не удлиняет змейку: длина замера постоянна
+            engine.growing[:] = False
+        elapsed = (time.perf_counter() - started) / steps * 1e6
+        assert not reset and engine.lengths[0] == length, (
+            'игра закончилась во время замера')
+        print(f'{engine.lengths[0]:>8} {fill:>11.0%} {elapsed:>9.2f}')
+
+
+def benchmark(games, steps, width, height, seed):
+    """
+    Измерить скорость самоигры со случайными действиями.
+
+    :param games: Число одновременных игр.
+    :param steps: Число шагов.
+    :param width: Ширина поля.
+    :param height: Высота поля.
+    :param seed: Зерно генератора.
+    """
+    import time
+
+    engine = SnakeEngine(games, width, height, seed)
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, len(DIRECTIONS), (steps, games))
+    finished = 0
+    started = time.perf_counter()
+    for step_actions in actions:
+        _, dones = engine.step(step_actions)
+        finished += int(dones.sum())
+    elapsed = time.perf_counter() - started
+    print(f'{games} игр x {steps} шагов на поле {width}x{height}: '
+          f'{elapsed:.2f} с')
+    print(f'{games * steps / elapsed:,.0f} шагов/с, '
+          f'{finished / elapsed:,.0f} завершённых игр/с')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Бенчмарк движка змейки')
+    parser.add_argument('--bench', action='store_true')
+    parser.add_argument('--bench-length', type=int, nargs='?', const=200,
+                        metavar='SIZE',
+                        help='шаг длинной змейки на поле SIZE x SIZE')
+    parser.add_argument('--games', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--width', type=int, default=32)
+    parser.add_argument('--height', type=int, default=24)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.games, args.steps, args.width, args.height, args.seed)
+    elif args.bench_length:
+        benchmark_length(args.bench_length, args.steps, args.seed)
+    else:
+        parser.print_help()
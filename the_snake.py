@@ -1,18 +1,15 @@
-from random import randint, choice
+from time import perf_counter
+
 import pygame as pg
 
+from snake_engine import DIRECTIONS, DOWN, LEFT, RIGHT, UP, SnakeEngine
+
 # Константы для размеров экрана и сетки
 SCREEN_WIDTH, SCREEN_HEIGHT = 640, 480
 GRID_SIZE = 20
 GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
 GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
 
-# Направления
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
-
 # Цвета
 BOARD_BACKGROUND_COLOR = (0, 0, 0)
 BORDER_COLOR = (93, 216, 228)
@@ -22,13 +19,46 @@ SNAKE_COLOR = (0, 255, 0)
 # Центр экрана
 CENTER_POSITION = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
 
-# Настройка окна игры
-pg.init()
-screen = pg.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pg.display.set_caption('Игра Змейка')
-clock = pg.time.Clock()
 SPEED = 10
 
+# Полоса под полем для времени кадра
+OVERLAY_HEIGHT = 20
+OVERLAY_FONT_SIZE = 20
+
+# Окно игры создаётся в init_display, чтобы импорт не требовал дисплея
+screen = None
+clock = None
+
+
+def init_display(width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+    """Создать окно игры."""
+    global screen, clock
+    pg.init()
+    screen = pg.display.set_mode((width, height))
+    pg.display.set_caption('Игра Змейка')
+    clock = pg.time.Clock()
+
+
+def cell_position(cell, grid_width=GRID_WIDTH):
+    """Перевести номер клетки движка в координаты на экране."""
+    y, x = divmod(int(cell), grid_width)
+    return x * GRID_SIZE, y * GRID_SIZE
+
+
+def make_cell_surface(body_color, border_color):
+    """Заранее отрисовать ячейку, чтобы в кадре остался только blit."""
+    surface = pg.Surface((GRID_SIZE, GRID_SIZE))
+    rect = surface.get_rect()
+    pg.draw.rect(surface, body_color, rect)
+    pg.draw.rect(surface, border_color, rect, 1)
+    return surface
+
+
+def clear_cell(position):
+    """Закрасить ячейку фоном и вернуть её прямоугольник."""
+    return screen.fill(BOARD_BACKGROUND_COLOR,
+                       pg.Rect(position, (GRID_SIZE, GRID_SIZE)))
+
 
 class GameObject:
     """Базовый класс для всех игровых объектов."""
@@ -38,12 +68,14 @@ class GameObject:
         self.body_color = body_color
         self.border_color = border_color
         self.position = CENTER_POSITION
+        self.cell_surface = None
 
     def draw_cell(self, position):
-        """Отрисовать одну ячейку."""
-        rect = pg.Rect(position, (GRID_SIZE, GRID_SIZE))
-        pg.draw.rect(screen, self.body_color, rect)
-        pg.draw.rect(screen, self.border_color, rect, 1)
+        """Отрисовать одну ячейку и вернуть её прямоугольник."""
+        if self.cell_surface is None:
+            self.cell_surface = make_cell_surface(self.body_color,
+                                                  self.border_color)
+        return screen.blit(self.cell_surface, position)
 
     def draw(self):
         """Отрисовать игровой объект."""
@@ -52,75 +84,121 @@ class GameObject:
 
 
 class Apple(GameObject):
-    """Класс, представляющий яблоко."""
+    """Класс, представляющий яблоко игры движка."""
 
-    def __init__(self, body_color=APPLE_COLOR, border_color=BORDER_COLOR,
-                 occupied_positions=(CENTER_POSITION,)):
+    def __init__(self, engine, game=0, body_color=APPLE_COLOR,
+                 border_color=BORDER_COLOR):
         super().__init__(body_color, border_color)
-        self.randomize_position(occupied_positions)
-
-    def randomize_position(self, occupied_positions):
-        """Случайно разместить яблоко на игровом поле."""
-        while True:
-            self.position = (randint(0, GRID_WIDTH - 1) * GRID_SIZE,
-                             randint(0, GRID_HEIGHT - 1) * GRID_SIZE)
-            if self.position not in occupied_positions:
-                break
+        self.engine = engine
+        self.game = game
+        self.moved = False
+        self.update()
+
+    def update(self):
+        """Взять положение яблока из движка."""
+        cell = self.engine.apples[self.game]
+        # На заполненном поле яблока нет
+        position = (cell_position(cell, self.engine.width)
+                    if cell >= 0 else None)
+        self.moved = position != self.position
+        self.position = position
 
     def draw(self):
         """Отрисовать яблоко на экране."""
-        self.draw_cell(self.position)
+        if self.position is not None:
+            self.draw_cell(self.position)
+
+    def draw_changes(self):
+        """Отрисовать яблоко, если оно переместилось; вернуть прямоугольники."""
+        if self.moved and self.position is not None:
+            return [self.draw_cell(self.position)]
+        return []
 
 
 class Snake(GameObject):
-    """Класс, представляющий змейку."""
+    """Класс, представляющий змейку игры движка."""
 
-    def __init__(self, body_color=SNAKE_COLOR, border_color=BORDER_COLOR):
+    def __init__(self, engine, game=0, body_color=SNAKE_COLOR,
+                 border_color=BORDER_COLOR):
         super().__init__(body_color, border_color)
-        self.reset()  # Инициализация начального состояния
-        self.direction = RIGHT  # Змейка начинает движение вправо
-
-    def reset(self):
-        """Сбросить состояние змейки к начальному значению."""
-        self.positions = [self.position]
-        self.direction = choice([UP, DOWN, LEFT, RIGHT])
+        self.engine = engine
+        self.game = game
         self.next_direction = None
-        self.growing = False
+        self.update()
+
+    def update(self):
+        """Взять голову, освобождённую хвостом клетку и направление."""
+        engine = self.engine
+        self.head = cell_position(engine.heads[self.game], engine.width)
+        vacated = engine.vacated[self.game]
+        self.vacated = (cell_position(vacated, engine.width)
+                        if vacated >= 0 else None)
+        self.direction = DIRECTIONS[engine.directions[self.game]]
+
+    @property
+    def positions(self):
+        """Позиции тела от головы к хвосту."""
+        return [cell_position(cell, self.engine.width)
+                for cell in self.engine.body_cells(self.game)]
 
     def get_head_position(self):
         """Получить позицию головы змейки."""
-        return self.positions[0]
-
-    def grow(self):
-        """Увеличить змейку."""
-        self.growing = True
+        return self.head
 
     def update_direction(self):
-        """Обновить направление змейки."""
-        if self.next_direction:
-            self.direction = self.next_direction
-            self.next_direction = None
-
-    def move(self):
-        """Двигать змейку."""
-        head_x, head_y = self.get_head_position()
-        delta_x, delta_y = self.direction
-        new_head = (
-            (head_x + (delta_x * GRID_SIZE)) % SCREEN_WIDTH,
-            (head_y + (delta_y * GRID_SIZE)) % SCREEN_HEIGHT,
-        )
-
-        self.positions.insert(0, new_head)
-        if not self.growing:
-            self.positions.pop()
-        else:
-            self.growing = False
+        """Вернуть действие для движка: выбранное направление или -1."""
+        action = (DIRECTIONS.index(self.next_direction)
+                  if self.next_direction else -1)
+        self.next_direction = None
+        return action
 
     def draw(self):
         """Отрисовать змейку на экране."""
         for position in self.positions:
             self.draw_cell(position)
 
+    def draw_changes(self):
+        """
+        Стереть освобождённую хвостом клетку и отрисовать новую голову.
+
+        :return: Прямоугольники изменённых ячеек.
+        """
+        rects = []
+        if self.vacated is not None:
+            rects.append(clear_cell(self.vacated))
+        rects.append(self.draw_cell(self.head))
+        return rects
+
+
+class FrameTimer:
+    """Сглаженное время кадра, выводимое в полосе под полем."""
+
+    def __init__(self, position):
+        self.font = pg.font.Font(None, OVERLAY_FONT_SIZE)
+        self.rect = pg.Rect(position, (0, 0))
+        self.started = 0.0
+        self.frame_time = 0.0
+
+    def start(self):
+        """Начать замер кадра."""
+        self.started = perf_counter()
+
+    def stop(self):
+        """Закончить замер кадра."""
+        elapsed = perf_counter() - self.started
+        self.frame_time = (0.9 * self.frame_time + 0.1 * elapsed
+                           if self.frame_time else elapsed)
+
+    def draw(self, fps):
+        """Вывести время кадра и вернуть прямоугольники для обновления."""
+        rects = [screen.fill(BOARD_BACKGROUND_COLOR, self.rect)]
+        text = self.font.render(
+            f'кадр {self.frame_time * 1000:.2f} мс, {fps:.0f} FPS',
+            True, BORDER_COLOR)
+        self.rect = screen.blit(text, self.rect.topleft)
+        rects.append(self.rect)
+        return rects
+
 
 def handle_keys(snake):
     """Обработать нажатия клавиш."""
@@ -139,35 +217,58 @@ def handle_keys(snake):
                 snake.next_direction = RIGHT
 
 
-def main():
+def main(speed=SPEED, grid_width=GRID_WIDTH, grid_height=GRID_HEIGHT,
+         show_frame_time=False):
     """Основная функция игры."""
-    apple = Apple()
-    snake = Snake()
+    board_height = grid_height * GRID_SIZE
+    init_display(grid_width * GRID_SIZE,
+                 board_height + (OVERLAY_HEIGHT if show_frame_time else 0))
+    engine = SnakeEngine(1, grid_width, grid_height)
+    snake = Snake(engine)
+    apple = Apple(engine)
+    timer = FrameTimer((0, board_height)) if show_frame_time else None
+    redraw = True
 
     while True:
-        clock.tick(SPEED)
+        clock.tick(speed)
+        if timer:
+            timer.start()
         handle_keys(snake)
 
-        snake.update_direction()
-        snake.move()
-
-        # Проверка столкновения с яблоком
-        if snake.get_head_position() == apple.position:
-            snake.grow()
-            apple.randomize_position(snake.positions)
-
-        # Проверка на столкновения с границами или телом
-        if snake.get_head_position() in snake.positions[1:]:
-            snake.reset()
-            apple.randomize_position(snake.positions)
-
-        # Отрисовка объектов
-        screen.fill(BOARD_BACKGROUND_COLOR)
-        snake.draw()
-        apple.draw()
+        # Движение, яблоки и столкновения с телом обрабатывает движок
+        _, dones = engine.step([snake.update_direction()])
+        snake.update()
+        apple.update()
+
+        # Поле рисуется целиком только в начале игры, дальше —
+        # лишь изменившиеся ячейки
+        if redraw or dones[0]:
+            screen.fill(BOARD_BACKGROUND_COLOR)
+            snake.draw()
+            apple.draw()
+            rects = [screen.get_rect()]
+            redraw = False
+        else:
+            rects = snake.draw_changes() + apple.draw_changes()
+        if timer:
+            rects += timer.draw(clock.get_fps())
 
-        pg.display.update()
+        pg.display.update(rects)
+        if timer:
+            timer.stop()
 
 
 if __name__ == '__main__':
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Игра Змейка')
+    parser.add_argument('--speed', type=int, default=SPEED,
+                        help='кадров в секунду, 0 — без ограничения')
+    parser.add_argument('--width', type=int, default=GRID_WIDTH,
+                        help='ширина поля в ячейках')
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT,
+                        help='высота поля в ячейках')
+    parser.add_argument('--frame-time', action='store_true',
+                        help='показывать время кадра')
+    args = parser.parse_args()
+    main(args.speed, args.width, args.height, args.frame_time)
@@ -0,0 +1,283 @@
+"""
+Движок крестиков-ноликов на битовых досках для game.py: поле N x N,
+победа — k в ряд, компьютерный соперник на альфа-бета минимаксе
+с таблицей транспозиций и итеративным углублением.
+
+Бенчмарк: python tictactoe_engine.py --bench --time 2
+"""
+import random
+from time import perf_counter
+
+# Оценка выигрыша; больше любой эвристической оценки
+WIN_SCORE = 1 << 40
+# Виды записей таблицы транспозиций
+EXACT, LOWER, UPPER = 0, 1, 2
+# Как часто (в узлах) проверять, не истекло ли время
+TIME_CHECK_NODES = 1024
+
+
+class SearchTimeout(Exception):
+    """Время на поиск хода истекло."""
+
+
+def build_win_masks(size, win_length):
+    """
+    Строит маски всех выигрышных линий.
+
+    :param size: Размер поля.
+    :param win_length: Сколько знаков в ряд нужно для победы.
+    :return: Список битовых масок, бит клетки — row * size + column.
+    """
+    masks = []
+    for row in range(size):
+        for column in range(size):
+            for d_row, d_column in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + d_row * (win_length - 1)
+                end_column = column + d_column * (win_length - 1)
+                if not (0 <= end_row < size and 0 <= end_column < size):
+                    continue
+                mask = 0
+                for step in range(win_length):
+                    mask |= 1 << ((row + d_row * step) * size
+                                  + column + d_column * step)
+                masks.append(mask)
+    return masks
+
+
+class BitBoard:
+    """
+    Поле в виде двух целых: биты клеток X и биты клеток O.
+
+    Для каждой клетки заранее известны линии через неё, поэтому
+    проверка победы после хода не зависит от размера поля.
+    """
+
+    def __init__(self, size=3, win_length=None, seed=0):
+        self.size = size
+        self.win_length = win_length or size
+        if not 1 <= self.win_length <= size:
+            raise ValueError('Длина линии должна быть от 1 до размера поля.')
+        self.cells = size * size
+        self.full_mask = (1 << self.cells) - 1
+        self.win_masks = build_win_masks(size, self.win_length)
+        self.cell_masks = [
+            [mask for mask in self.win_masks if mask >> cell & 1]
+            for cell in range(self.cells)]
+        # Клетки от центра к краям: сильные ходы перебираются первыми
+        center = (size - 1) / 2
+        self.move_order = sorted(
+            range(self.cells),
+            key=lambda cell: (abs(cell // size - center)
+                              + abs(cell % size - center)))
+        # Веса незаблокированных линий по числу знаков в них
+        self.line_weights = [0] + [4 ** count
+                                   for count in range(self.win_length)]
+
+        rng = random.Random(seed)
+        self.zobrist = [[rng.getrandbits(64) for _ in range(self.cells)]
+                        for _ in range(2)]
+        self.side_key = rng.getrandbits(64)
+
+        self.stones = [0, 0]  # X, O
+        self.turn = 0
+        self.hash = 0
+        self.history = []
+        self.winner = None
+
+    @property
+    def occupied(self):
+        """Биты занятых клеток."""
+        return self.stones[0] | self.stones[1]
+
+    def is_free(self, cell):
+        """Проверить, свободна ли клетка."""
+        return not self.occupied >> cell & 1
+
+    def is_full(self):
+        """Проверить, заполнено ли поле."""
+        return self.occupied == self.full_mask
+
+    def empty_count(self):
+        """Число свободных клеток."""
+        return self.cells - self.occupied.bit_count()
+
+    def play(self, cell):
+        """
+        Поставить знак стороны, которая ходит, в клетку.
+
+        :param cell: Номер клетки row * size + column.
+        :return: True, если ход выиграл.
+        """
+        player = self.turn
+        self.stones[player] |= 1 << cell
+        self.hash ^= self.zobrist[player][cell] ^ self.side_key
+        self.history.append(cell)
+        self.turn ^= 1
+        stones = self.stones[player]
+        if any(stones & mask == mask for mask in self.cell_masks[cell]):
+            self.winner = player
+            return True
+        return False
+
+    def undo(self):
+        """Отменить последний ход."""
+        cell = self.history.pop()
+        self.turn ^= 1
+        self.stones[self.turn] ^= 1 << cell
+        self.hash ^= self.zobrist[self.turn][cell] ^ self.side_key
+        self.winner = None
+
+    def evaluate(self):
+        """
+        Эвристическая оценка для стороны, которая ходит: линии, где есть
+        только её знаки, минус линии только со знаками соперника.
+        """
+        mine, theirs = self.stones[self.turn], self.stones[self.turn ^ 1]
+        weights = self.line_weights
+        score = 0
+        for mask in self.win_masks:
+            if not theirs & mask:
+                score += weights[(mine & mask).bit_count()]
+            elif not mine & mask:
+                score -= weights[(theirs & mask).bit_count()]
+        return score
+
+
+class Searcher:
+    """
+    Поиск хода негамаксом с альфа-бета отсечением. Таблица транспозиций
+    по хешу Зобриста сохраняется между ходами одной партии.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        # Хеш -> (глубина, оценка, вид оценки, лучший ход)
+        self.table = {}
+        self.nodes = 0
+        self.deadline = float('inf')
+
+    def ordered_moves(self, first):
+        """Свободные клетки: сначала ход из таблицы, затем от центра."""
+        board = self.board
+        if first >= 0 and board.is_free(first):
+            yield first
+        for cell in board.move_order:
+            if cell != first and board.is_free(cell):
+                yield cell
+
+    def negamax(self, depth, alpha, beta):
+        """
+        Оценить позицию для стороны, которая ходит.
+
+        :raises SearchTimeout: Если истекло время поиска.
+        """
+        board = self.board
+        self.nodes += 1
+        if (not self.nodes % TIME_CHECK_NODES
+                and perf_counter() > self.deadline):
+            raise SearchTimeout
+        empty = board.empty_count()
+        if board.winner is not None:
+            # Чем раньше победа, тем больше свободных клеток и оценка
+            return -(WIN_SCORE + empty)
+        if not empty:
+            return 0
+        if not depth:
+            return board.evaluate()
+        # Глубже конца партии искать нечего: такая оценка точна
+        depth = min(depth, empty)
+
+        original_alpha = alpha
+        best_move = -1
+        entry = self.table.get(board.hash)
+        if entry is not None:
+            entry_depth, value, kind, best_move = entry
+            if entry_depth >= depth:
+                if kind == EXACT:
+                    return value
+                if kind == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        best_value = -float('inf')
+        for cell in self.ordered_moves(best_move):
+            board.play(cell)
+            try:
+                value = -self.negamax(depth - 1, -beta, -alpha)
+            finally:
+                board.undo()
+            if value > best_value:
+                best_value, best_move = value, cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            kind = UPPER
+        elif best_value >= beta:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.table[board.hash] = (depth, best_value, kind, best_move)
+        return best_value
+
+    def search(self, time_budget=1.0, max_depth=None):
+        """
+        Итеративное углубление, пока не истечёт время или партия
+        не будет просчитана до конца.
+
+        :param time_budget: Время на ход в секундах.
+        :param max_depth: Наибольшая глубина; по умолчанию до конца партии.
+        :return: Лучший ход, его оценка и глубина последней полной итерации.
+        """
+        board = self.board
+        empty = board.empty_count()
+        max_depth = min(max_depth or empty, empty)
+        self.deadline = perf_counter() + time_budget
+        self.nodes = 0
+        best = (next(self.ordered_moves(-1), -1), 0, 0)
+        for depth in range(1, max_depth + 1):
+            try:
+                value = self.negamax(depth, -float('inf'), float('inf'))
+            except SearchTimeout:
+                break
+            best = (self.table[board.hash][3], value, depth)
+            if abs(value) >= WIN_SCORE:
+                break
+        return best
+
+
+def benchmark(time_budget):
+    """
+    Измерить скорость поиска из начальной позиции на разных полях.
+
+    :param time_budget: Время на поиск для каждого поля в секундах.
+    """
+    print(f'{"поле":>8} {"глубина":>8} {"узлов":>10} '
+          f'{"позиций/с":>11} {"ход":>5} {"оценка":>14}')
+    for size, win_length in ((3, 3), (4, 3), (4, 4), (5, 4), (7, 5)):
+        searcher = Searcher(BitBoard(size, win_length))
+        started = perf_counter()
+        move, value, depth = searcher.search(time_budget)
+        elapsed = perf_counter() - started
+        print(f'{f"{size}x{size}/{win_length}":>8} {depth:>8} '
+              f'{searcher.nodes:>10} {searcher.nodes / elapsed:>11,.0f} '
+              f'{move:>5} {value:>14}')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк движка крестиков-ноликов')
+    parser.add_argument('--bench', action='store_true')
+    parser.add_argument('--time', type=float, default=2.0,
+                        help='время поиска на поле, с')
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.time)
+    else:
+        parser.print_help()
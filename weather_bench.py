@@ -0,0 +1,445 @@
+"""
+Бенчмарк погодного сервиса из script.py на локальной заглушке api.open-meteo.com.
+
+Запуск:
+    python weather_bench.py pool --requests 2000 --concurrency 50
+    python weather_bench.py coalesce --requests 500
+    python weather_bench.py resilience --requests 200
+    python weather_bench.py metrics --requests 5000
+    python weather_bench.py load --requests 5000 --concurrency 100 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+import script
+
+# Заглушка внешнего API погоды
+upstream = FastAPI()
+# latency + случайная jitter — задержка ответа, status — код всех ответов,
+# fail_streak — сколько ответов 503 подряд предшествует каждому успешному
+# ответу для одних координат, point_calls — число запросов по координатам
+upstream_state = {"calls": 0, "latency": 0.0, "jitter": 0.0, "status": 200, "fail_streak": 0, "point_calls": {}}
+# Начало почасового прогноза заглушки
+FORECAST_START = datetime(2024, 1, 1)
+
+
+def hourly_forecast(hourly: str, forecast_days: int) -> dict:
+    """
+    Строит почасовой прогноз, где значение каждой переменной равно номеру часа.
+
+    :param hourly: Переменные через запятую.
+    :param forecast_days: Число дней прогноза.
+    :return: Почасовой прогноз в формате Open-Meteo.
+    """
+    hours = range(forecast_days * 24)
+    series = {"time": [(FORECAST_START + timedelta(hours=hour)).isoformat(timespec="minutes") for hour in hours]}
+    for name in hourly.split(","):
+        series[name] = [float(hour) for hour in hours]
+    return series
+
+
+@upstream.get("/v1/forecast")
+async def forecast(latitude: str, longitude: str, hourly: str = "", forecast_days: int = 7):
+    """
+    Отвечает в формате Open-Meteo с текущей погодой и почасовым прогнозом.
+
+    :param latitude: Широта или несколько широт через запятую.
+    :param longitude: Долгота или несколько долгот через запятую.
+    :param hourly: Переменные почасового прогноза через запятую.
+    :param forecast_days: Число дней прогноза.
+    :return: Данные о погоде (список — для нескольких точек).
+    """
+    upstream_state["calls"] += 1
+    if upstream_state["latency"] or upstream_state["jitter"]:
+        await asyncio.sleep(upstream_state["latency"] + random.uniform(0, upstream_state["jitter"]))
+    if upstream_state["status"] != 200:
+        raise HTTPException(status_code=upstream_state["status"], detail="Injected failure")
+    if upstream_state["fail_streak"]:
+        point_calls = upstream_state["point_calls"]
+        point = f"{latitude};{longitude}"
+        point_calls[point] = point_calls.get(point, 0) + 1
+        if point_calls[point] % (upstream_state["fail_streak"] + 1):
+            raise HTTPException(status_code=503, detail="Injected failure")
+    locations = [
+        {
+            "latitude": float(lat),
+            "longitude": float(lon),
+            "current_weather": {
+                "temperature": 12.5,
+                "windspeed": 3.4,
+                "pressure": 1013.0,
+                "time": "2024-01-01T12:00",
+            },
+            **({"hourly": hourly_forecast(hourly, forecast_days)} if hourly else {}),
+        }
+        for lat, lon in zip(latitude.split(","), longitude.split(","))
+    ]
+    return locations if len(locations) > 1 else locations[0]
+
+
+def start_server(app: FastAPI, port: int) -> uvicorn.Server:
+    """
+    Запускает приложение в фоновом потоке и ждёт готовности сервера.
+
+    :param app: Приложение для запуска.
+    :param port: Порт на 127.0.0.1.
+    :return: Запущенный сервер (остановка через server.should_exit = True).
+    """
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def fetch_with_new_client(lat: float, lon: float) -> dict:
+    """
+    Прежнее поведение: новый клиент (и новое соединение) на каждый запрос.
+    Параметры те же, что у script.fetch_weather_data, чтобы сравнивались одинаковые ответы.
+    """
+    async with httpx.AsyncClient() as client:
+        response = await client.get(
+            script.OPEN_METEO_URL,
+            params={"latitude": lat, "longitude": lon, **script.FORECAST_PARAMS},
+        )
+        return response.json()
+
+
+async def run_load(fetch, total: int, concurrency: int) -> float:
+    """
+    Выполняет total вызовов fetch не более чем по concurrency одновременно.
+
+    :param fetch: Корутинная функция (lat, lon) -> dict.
+    :param total: Общее число вызовов.
+    :param concurrency: Максимум одновременных вызовов.
+    :return: Число запросов в секунду.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            await fetch(55.75 + i % 10, 37.61)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - started)
+
+
+async def bench_client_pool(args: argparse.Namespace) -> None:
+    """Сравнивает клиент на каждый запрос с общим пулом соединений."""
+    total, concurrency = args.requests, args.concurrency
+    script.upstream_limiter.rate = script.upstream_limiter.capacity = 1e9
+    before = await run_load(fetch_with_new_client, total, concurrency)
+    after = await run_load(script.fetch_weather_data, total, concurrency)
+    await script.get_http_client().aclose()
+    print(f"new client per call: {before:8.1f} req/s")
+    print(f"shared pooled client: {after:8.1f} req/s ({after / before:.2f}x)")
+
+
+def app_client() -> httpx.AsyncClient:
+    """Возвращает клиент, обращающийся к приложению script.app без сети."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=script.app), base_url="http://app")
+
+
+async def check_coalescing(args: argparse.Namespace) -> None:
+    """
+    Проверяет, что total одновременных запросов /weather по одним координатам
+    порождают один общий запрос к API, в том числе когда API отвечает ошибкой.
+    """
+    total = args.requests
+    async with app_client() as client:
+        for status in (500, 200):
+            script.weather_cache.entries.clear()
+            upstream_state["calls"], upstream_state["status"] = 0, status
+            responses = await asyncio.gather(
+                *(client.get("/weather", params={"lat": 48.85, "lon": 2.35}) for _ in range(total))
+            )
+            codes = {response.status_code for response in responses}
+            print(f"upstream status {status}: {total} requests -> "
+                  f"{upstream_state['calls']} upstream call(s), response codes {sorted(codes)}")
+            # Ошибка 500 повторяется UPSTREAM_RETRIES раз внутри одного общего запроса
+            expected = 1 if status == 200 else script.UPSTREAM_RETRIES + 1
+            assert upstream_state["calls"] == expected, "requests were not coalesced"
+            assert codes == {status}, "error was not propagated to every waiter"
+    await script.get_http_client().aclose()
+
+
+def expire_cache(seconds: float) -> None:
+    """Состаривает все записи кэша на seconds секунд."""
+    for key, (fetched_at, data) in list(script.weather_cache.entries.items()):
+        script.weather_cache.entries[key] = (fetched_at - timedelta(seconds=seconds), data)
+
+
+async def check_resilience(args: argparse.Namespace) -> None:
+    """
+    Проверяет повторы при сбоях, размыкание выключателя
+    и выдачу последних данных при полном отказе API.
+
+    Сбои детерминированы: по каждым координатам первые UPSTREAM_RETRIES
+    попыток получают 503, поэтому ожидаемое число запросов к API известно заранее.
+    """
+    total, concurrency = args.requests, args.concurrency
+    script.UPSTREAM_BACKOFF_SECONDS = 0.01
+    script.upstream_breaker.reset_timeout = 0.5
+    params = [{"lat": 40 + i % 20, "lon": 10.0} for i in range(total)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(client: httpx.AsyncClient) -> list[int]:
+        async def one(point: dict) -> int:
+            async with semaphore:
+                return (await client.get("/weather", params=point)).status_code
+        return await asyncio.gather(*(one(point) for point in params))
+
+    async with app_client() as client:
+        fail_streak = script.UPSTREAM_RETRIES
+        points = len({(point["lat"], point["lon"]) for point in params})
+        # Выключатель не должен мешать проверке повторов
+        script.upstream_breaker.failure_threshold = points * fail_streak + 1
+        upstream_state["calls"], upstream_state["fail_streak"] = 0, fail_streak
+        upstream_state["point_calls"].clear()
+        codes = await run(client)
+        script.upstream_breaker.failure_threshold = script.BREAKER_FAILURE_THRESHOLD
+        print(f"{fail_streak} failure(s) before each success: {codes.count(200)}/{total} ok, "
+              f"{upstream_state['calls']} upstream calls, breaker {script.upstream_breaker.stats()}")
+        assert codes.count(200) == total, "retries did not absorb failures"
+        assert upstream_state["calls"] == points * (fail_streak + 1), "unexpected number of upstream calls"
+
+        expire_cache(script.update_interval.total_seconds() + script.STALE_WHILE_REVALIDATE_SECONDS)
+        upstream_state["calls"], upstream_state["fail_streak"], upstream_state["status"] = 0, 0, 503
+        codes = await run(client)
+        print(f"full outage: {codes.count(200)}/{total} served stale, "
+              f"{upstream_state['calls']} upstream calls, breaker {script.upstream_breaker.stats()}")
+        assert codes.count(200) == total, "stale data was not served during the outage"
+        assert script.upstream_breaker.state == script.upstream_breaker.OPEN, "breaker did not trip"
+
+        upstream_state["calls"], upstream_state["status"] = 0, 200
+        await asyncio.sleep(script.upstream_breaker.reset_timeout)
+        codes = await run(client)
+        print(f"recovery: {codes.count(200)}/{total} ok, "
+              f"{upstream_state['calls']} upstream calls, breaker {script.upstream_breaker.stats()}")
+        assert script.upstream_breaker.state == script.upstream_breaker.CLOSED, "breaker did not close"
+        print("cache:", script.weather_cache.stats())
+    await script.get_http_client().aclose()
+
+
+async def bench_metrics_overhead(args: argparse.Namespace) -> None:
+    """Измеряет задержку закэшированного /weather с метриками и без них."""
+    total = args.requests
+    params = {"lat": 59.93, "lon": 30.31}
+    async with app_client() as client:
+        await client.get("/weather", params=params)
+        timings = {}
+        for _ in range(3):
+            for enabled in (False, True):
+                script.metrics.enabled = enabled
+                started = time.perf_counter()
+                for _ in range(total):
+                    await client.get("/weather", params=params)
+                elapsed = (time.perf_counter() - started) / total * 1e6
+                timings[enabled] = min(timings.get(enabled, elapsed), elapsed)
+        script.metrics.enabled = True
+        print(f"without metrics: {timings[False]:7.1f} us/request")
+        print(f"with metrics:    {timings[True]:7.1f} us/request "
+              f"(+{timings[True] - timings[False]:.1f} us)")
+        print((await client.get("/metrics")).text.count("\n"), "lines on /metrics")
+    await script.get_http_client().aclose()
+
+
+def start_app(args: argparse.Namespace, data_dir: str) -> subprocess.Popen:
+    """
+    Запускает script.py отдельным процессом, настроенным на заглушку API,
+    и ждёт, пока он начнёт отвечать.
+
+    :param args: Параметры бенчмарка.
+    :param data_dir: Каталог для баз SQLite; у каждого прогона свой,
+        чтобы города и кэш прошлых прогонов не влияли на результат.
+    :return: Процесс приложения.
+    """
+    env = dict(
+        os.environ,
+        OPEN_METEO_URL=f"http://127.0.0.1:{args.port}/v1/forecast",
+        PORT=str(args.app_port),
+        WORKERS=str(args.workers),
+        STORAGE_PATH=os.path.join(data_dir, "weather.db"),
+        CACHE_PATH=os.path.join(data_dir, "weather.db"),
+    )
+    if args.workers > 1:
+        env.setdefault("STORAGE_BACKEND", "sqlite")
+        env.setdefault("CACHE_BACKEND", "sqlite")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "script.py")],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{args.app_port}/cities", params={"user_id": 0})
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Application did not start")
+
+
+async def run_phase(client: httpx.AsyncClient, requests: list, concurrency: int) -> dict:
+    """
+    Выполняет запросы не более чем по concurrency одновременно и собирает статистику.
+
+    :param client: HTTP-клиент приложения.
+    :param requests: Список (метод, путь, параметры).
+    :param concurrency: Максимум одновременных запросов.
+    :return: Число запросов и ошибок, RPS, p50/p95/p99 в мс, запросы к API.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(method: str, path: str, params: dict) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params)
+                errors += response.status_code >= 400
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    upstream_before = upstream_state["calls"]
+    started = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in requests))
+    elapsed = time.perf_counter() - started
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "rps": round(len(requests) / elapsed, 1),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p95_ms": round(percentiles[94] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+        "upstream_calls": upstream_state["calls"] - upstream_before,
+    }
+
+
+def git_revision() -> str:
+    """Возвращает текущую ревизию git или пустую строку."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+async def run_load_test(args: argparse.Namespace) -> None:
+    """
+    Нагрузочный тест: запускает приложение отдельным процессом и по очереди
+    нагружает /add_city, /cities, /weather и /weather_at_time, сохраняя
+    RPS, перцентили задержки и число запросов к API в JSON.
+    """
+    total, concurrency = args.requests, args.concurrency
+    rng = random.Random(args.seed)
+    cities = [
+        (f"city{index}", round(rng.uniform(-60, 60), 2), round(rng.uniform(-180, 180), 2))
+        for index in range(args.cities)
+    ]
+    users = [rng.randrange(args.users) for _ in range(total)]
+    placed = {}
+    add_requests = []
+    for user in users:
+        name, lat, lon = rng.choice(cities)
+        placed.setdefault(user, []).append(name)
+        add_requests.append(("POST", "/add_city", {"city_name": name, "lat": lat, "lon": lon, "user_id": user}))
+    phases = {
+        "add_city": add_requests,
+        "cities": [("GET", "/cities", {"user_id": user}) for user in users],
+        "weather": [("GET", "/weather", {"lat": lat, "lon": lon})
+                    for _, lat, lon in (rng.choice(cities) for _ in range(total))],
+        "weather_at_time": [
+            ("GET", "/weather_at_time", {
+                "city_name": rng.choice(placed[user]), "user_id": user,
+                "time": (FORECAST_START + timedelta(minutes=rng.randrange((7 * 24 - 1) * 60))).isoformat(),
+                "parameters": "temperature,windspeed",
+            })
+            for user in users
+        ],
+    }
+
+    data_dir = tempfile.TemporaryDirectory()
+    process = start_app(args, data_dir.name)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    report = {
+        "revision": git_revision(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {key: value for key, value in vars(args).items() if key != "scenario"},
+        "endpoints": {},
+    }
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.app_port}", limits=limits,
+                                     timeout=60) as client:
+            for name, requests in phases.items():
+                report["endpoints"][name] = stats = await run_phase(client, requests, concurrency)
+                print(f"{name:>16}: {stats['rps']:9.1f} req/s  p50 {stats['p50_ms']:7.2f} ms  "
+                      f"p95 {stats['p95_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms  "
+                      f"errors {stats['errors']}  upstream {stats['upstream_calls']}")
+    finally:
+        process.terminate()
+        process.wait()
+        data_dir.cleanup()
+    report["upstream_calls_total"] = upstream_state["calls"]
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"report saved to {args.output}")
+
+
+SCENARIOS = {
+    "pool": bench_client_pool,
+    "coalesce": check_coalescing,
+    "resilience": check_resilience,
+    "metrics": bench_metrics_overhead,
+    "load": run_load_test,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", choices=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушки, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, с")
+    # Параметры сценария load
+    parser.add_argument("--app-port", type=int, default=8766)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_output.json")
+    args = parser.parse_args()
+
+    upstream_state["latency"], upstream_state["jitter"] = args.latency, args.jitter
+    server = start_server(upstream, args.port)
+    script.OPEN_METEO_URL = f"http://127.0.0.1:{args.port}/v1/forecast"
+    try:
+        asyncio.run(SCENARIOS[args.scenario](args))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
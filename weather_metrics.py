@@ -0,0 +1,238 @@
+"""
+Метрики в текстовом формате Prometheus и ASGI-промежуточный слой для их сбора.
+"""
+import cProfile
+import logging
+import os
+from bisect import bisect_left
+from datetime import datetime
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержки по умолчанию, в секундах
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names: tuple[str, ...], values: tuple) -> str:
+    """
+    Форматирует метки в виде {name="value",...}.
+
+    :param names: Имена меток.
+    :param values: Значения меток.
+    :return: Строка меток (пустая, если меток нет).
+    """
+    if not names:
+        return ""
+    pairs = (f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def escape_label(value) -> str:
+    """Экранирует значение метки по правилам формата Prometheus."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    """Монотонно растущий счётчик с метками; может вычисляться при сборе через callback."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = (), callback=None):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.callback = callback
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        """Увеличивает значение для заданных меток."""
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def samples(self):
+        """Возвращает строки значений метрики."""
+        if self.callback is not None:
+            self.values[()] = float(self.callback())
+        for label_values, value in self.values.items():
+            yield f"{self.name}{format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    """Значение, которое может расти и убывать."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *label_values) -> None:
+        """Устанавливает значение для заданных меток."""
+        self.values[label_values] = value
+
+    def dec(self, *label_values, amount: float = 1.0) -> None:
+        """Уменьшает значение для заданных меток."""
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, суммой и числом наблюдений."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # Метки -> [счётчики корзин (последняя — +Inf), сумма]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        """Добавляет наблюдение для заданных меток."""
+        state = self.values.get(label_values)
+        if state is None:
+            state = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self):
+        """Возвращает строки корзин (накопительно), суммы и числа наблюдений."""
+        names = self.labels + ("le",)
+        for label_values, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels(names, label_values + (bound,))} {cumulative}"
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """Набор метрик, отдаваемых одной страницей /metrics."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.metrics = []
+
+    def register(self, metric):
+        """Регистрирует метрику и возвращает её."""
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, description: str, labels: tuple[str, ...] = (), callback=None) -> Counter:
+        """Создаёт и регистрирует счётчик; callback вычисляет значение при сборе."""
+        return self.register(Counter(name, description, labels, callback))
+
+    def gauge(self, name: str, description: str, labels: tuple[str, ...] = (), callback=None) -> Gauge:
+        """Создаёт и регистрирует измеритель; callback вычисляет значение при сборе."""
+        return self.register(Gauge(name, description, labels, callback))
+
+    def histogram(self, name: str, description: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Создаёт и регистрирует гистограмму."""
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI-слой: измеряет задержку и статус каждого HTTP-запроса по шаблону
+    маршрута и при заголовке profile_header профилирует запрос через cProfile.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, profile_header: str = "",
+                 profile_dir: str = "", profile_slow_seconds: float = 0.0):
+        self.app = app
+        self.registry = registry
+        self.profile_header = profile_header.lower().encode()
+        self.profile_dir = profile_dir
+        self.profile_slow_seconds = profile_slow_seconds
+        # В процессе может работать только один профилировщик cProfile
+        self.profiling = False
+        self.latency = registry.histogram(
+            "weather_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+        self.requests = registry.counter(
+            "weather_http_requests_total", "HTTP requests by status", ("method", "route", "status"))
+        self.errors = registry.counter(
+            "weather_http_errors_total", "HTTP responses with status >= 500", ("method", "route"))
+        self.in_flight = registry.gauge("weather_http_requests_in_flight", "HTTP requests being served")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = self.start_profiler(scope)
+        self.in_flight.inc()
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - started
+            self.in_flight.dec()
+            route = scope.get("route")
+            # Шаблон маршрута вместо пути, чтобы число меток было ограничено
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            self.latency.observe(elapsed, method, path)
+            self.requests.inc(method, path, status)
+            if status >= 500:
+                self.errors.inc(method, path)
+            if profiler is not None:
+                self.save_profile(profiler, path, elapsed)
+
+    def start_profiler(self, scope) -> cProfile.Profile | None:
+        """
+        Включает профилировщик, если запрос содержит заголовок профилирования.
+
+        Одновременно профилируется один запрос: пока профиль предыдущего
+        не сохранён, остальные запросы выполняются без профилирования.
+        """
+        if not self.profile_header:
+            return None
+        for name, value in scope["headers"]:
+            if name == self.profile_header and value not in (b"", b"0"):
+                if self.profiling:
+                    logger.debug("Profiler is busy, %s is not profiled", scope["path"])
+                    return None
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Профилировщик уже включён вне этого слоя (Python 3.12+)
+                    logger.debug("Another profiler is active, %s is not profiled", scope["path"])
+                    return None
+                self.profiling = True
+                return profiler
+        return None
+
+    def save_profile(self, profiler: cProfile.Profile, path: str, elapsed: float) -> None:
+        """
+        Сохраняет профиль медленного запроса в файл .prof (pstats, snakeviz).
+
+        Профилировщик охватывает весь цикл событий, поэтому в профиль
+        попадают и одновременно выполнявшиеся запросы.
+        """
+        profiler.disable()
+        self.profiling = False
+        if elapsed < self.profile_slow_seconds:
+            return
+        name = path.strip("/").replace("/", "_") or "root"
+        filename = os.path.join(self.profile_dir, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}.prof")
+        profiler.dump_stats(filename)
+        logger.info("Profile of %s (%.1f ms) saved to %s", path, elapsed * 1000, filename)
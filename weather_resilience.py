@@ -0,0 +1,84 @@
+"""
+Защита внешнего API погоды: ограничение частоты запросов и автоматический выключатель.
+"""
+import asyncio
+from time import monotonic
+
+
+class TokenBucket:
+    """Ограничитель частоты «ведро с токенами»: rate токенов в секунду, не более capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self) -> None:
+        """Начисляет токены за прошедшее время."""
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """Ждёт, пока не освободится токен, и забирает его."""
+        async with self.lock:
+            self.refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель: после failure_threshold ошибок подряд
+    размыкается на reset_timeout секунд, затем пропускает один пробный вызов.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """
+        Проверяет, можно ли выполнить вызов.
+
+        :return: False, пока выключатель разомкнут или пробный вызов ещё не завершён.
+        """
+        if self.state == self.CLOSED:
+            return True
+        if monotonic() - self.opened_at >= self.reset_timeout:
+            # Пробный вызов; если он так и не завершится, следующий
+            # будет разрешён ещё через reset_timeout
+            self.state = self.HALF_OPEN
+            self.opened_at = monotonic()
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """Отмечает успешный вызов и замыкает выключатель."""
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        """Отмечает неудачный вызов и при необходимости размыкает выключатель."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = monotonic()
+
+    def stats(self) -> dict:
+        """Возвращает состояние выключателя."""
+        return {"state": self.state, "failures": self.failures, "trips": self.trips}
@@ -0,0 +1,285 @@
+"""
+Хранилища городов пользователей для погодного сервиса script.py.
+
+Бенчмарк поиска: python weather_storage.py --backend sqlite --users 1000000
+"""
+import sqlite3
+import threading
+from datetime import datetime
+
+CityKey = tuple[str, int]
+Location = tuple[float, float]
+
+
+class CityStorage:
+    """Базовый класс хранилища городов пользователей."""
+
+    def add_city(self, city_name: str, lat: float, lon: float, user_id: int,
+                 last_updated: datetime | None = None) -> None:
+        """
+        Добавляет город пользователю; повторное добавление обновляет координаты.
+
+        :param city_name: Название города.
+        :param lat: Широта города.
+        :param lon: Долгота города.
+        :param user_id: Идентификатор пользователя.
+        :param last_updated: Время последнего обновления данных (по умолчанию сейчас).
+        """
+        self.add_cities([(city_name, lat, lon, user_id)], last_updated)
+
+    def add_cities(self, records, last_updated: datetime | None = None) -> int:
+        """
+        Добавляет города пачкой.
+
+        :param records: Итерируемое кортежей (название, широта, долгота, пользователь).
+        :param last_updated: Время последнего обновления данных (по умолчанию сейчас).
+        :return: Число обработанных записей.
+        """
+        raise NotImplementedError('Метод add_cities должен '
+                                  'быть реализован в дочерних классах.')
+
+    def get_city(self, city_name: str, user_id: int) -> dict | None:
+        """
+        Возвращает данные города пользователя.
+
+        :param city_name: Название города.
+        :param user_id: Идентификатор пользователя.
+        :return: Словарь с lat, lon, last_updated или None.
+        """
+        raise NotImplementedError('Метод get_city должен '
+                                  'быть реализован в дочерних классах.')
+
+    def get_user_cities(self, user_id: int) -> list[dict]:
+        """
+        Возвращает города пользователя в порядке добавления.
+
+        :param user_id: Идентификатор пользователя.
+        :return: Список словарей с name, lat, lon.
+        """
+        raise NotImplementedError('Метод get_user_cities должен '
+                                  'быть реализован в дочерних классах.')
+
+    def locations(self) -> list[Location]:
+        """
+        Возвращает различные координаты всех отслеживаемых городов.
+
+        Вызывается из рабочего потока одновременно с остальными методами.
+        """
+        raise NotImplementedError('Метод locations должен '
+                                  'быть реализован в дочерних классах.')
+
+    def touch(self, locations: list[Location], last_updated: datetime) -> None:
+        """
+        Отмечает время обновления данных для всех городов с заданными координатами.
+
+        :param locations: Список координат.
+        :param last_updated: Время обновления.
+        """
+        raise NotImplementedError('Метод touch должен '
+                                  'быть реализован в дочерних классах.')
+
+    def close(self) -> None:
+        """Освобождает ресурсы хранилища."""
+
+
+class MemoryCityStorage(CityStorage):
+    """Хранилище в памяти процесса на словарях."""
+
+    def __init__(self):
+        self.cities: dict[CityKey, dict] = {}
+        # Пользователь -> название -> город; словарь сохраняет порядок и исключает дубли
+        self.user_cities: dict[int, dict[str, dict]] = {}
+        self.by_location: dict[Location, set[CityKey]] = {}
+
+    def add_cities(self, records, last_updated: datetime | None = None) -> int:
+        last_updated = last_updated or datetime.now()
+        count = 0
+        for city_name, lat, lon, user_id in records:
+            city_key = (city_name, user_id)
+            previous = self.cities.get(city_key)
+            if previous is not None:
+                self.by_location[(previous['lat'], previous['lon'])].discard(city_key)
+            self.cities[city_key] = {"lat": lat, "lon": lon, "last_updated": last_updated}
+            self.user_cities.setdefault(user_id, {})[city_name] = {"name": city_name, "lat": lat, "lon": lon}
+            self.by_location.setdefault((lat, lon), set()).add(city_key)
+            count += 1
+        return count
+
+    def get_city(self, city_name: str, user_id: int) -> dict | None:
+        return self.cities.get((city_name, user_id))
+
+    def get_user_cities(self, user_id: int) -> list[dict]:
+        return list(self.user_cities.get(user_id, {}).values())
+
+    def locations(self) -> list[Location]:
+        # list() копирует словарь целиком под GIL, пока цикл событий может его менять
+        return [location for location, city_keys in list(self.by_location.items()) if city_keys]
+
+    def touch(self, locations: list[Location], last_updated: datetime) -> None:
+        for location in locations:
+            for city_key in self.by_location.get(location, ()):
+                self.cities[city_key]['last_updated'] = last_updated
+
+
+class SQLiteCityStorage(CityStorage):
+    """
+    Хранилище в SQLite в режиме WAL: данные переживают перезапуск
+    и доступны нескольким процессам.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cities (
+            city_name TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            last_updated TEXT NOT NULL,
+            PRIMARY KEY (city_name, user_id)
+        );
+        CREATE INDEX IF NOT EXISTS cities_user_id ON cities (user_id);
+        CREATE INDEX IF NOT EXISTS cities_location ON cities (lat, lon);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Соединения рабочих потоков для чтения, по одному на поток
+        self.local = threading.local()
+        self.read_connections: list[sqlite3.Connection] = []
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA busy_timeout=5000")
+        self.connection.executescript(self.SCHEMA)
+
+    def add_cities(self, records, last_updated: datetime | None = None) -> int:
+        last_updated = (last_updated or datetime.now()).isoformat()
+        rows = ((city_name, user_id, lat, lon, last_updated) for city_name, lat, lon, user_id in records)
+        with self.connection:
+            self.connection.execute("BEGIN")
+            cursor = self.connection.executemany(
+                """
+                INSERT INTO cities (city_name, user_id, lat, lon, last_updated)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (city_name, user_id) DO UPDATE
+                SET lat = excluded.lat, lon = excluded.lon, last_updated = excluded.last_updated
+                """,
+                rows,
+            )
+        return cursor.rowcount
+
+    def get_city(self, city_name: str, user_id: int) -> dict | None:
+        row = self.connection.execute(
+            "SELECT lat, lon, last_updated FROM cities WHERE city_name = ? AND user_id = ?",
+            (city_name, user_id),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"lat": row[0], "lon": row[1], "last_updated": datetime.fromisoformat(row[2])}
+
+    def get_user_cities(self, user_id: int) -> list[dict]:
+        rows = self.connection.execute(
+            "SELECT city_name, lat, lon FROM cities WHERE user_id = ? ORDER BY rowid",
+            (user_id,),
+        )
+        return [{"name": name, "lat": lat, "lon": lon} for name, lat, lon in rows]
+
+    def read_connection(self) -> sqlite3.Connection:
+        """
+        Возвращает соединение текущего потока для чтения: запрос из рабочего
+        потока не должен попасть в транзакцию, открытую в цикле событий
+        на общем соединении. База в памяти видна только общему соединению.
+        """
+        if self.path == ":memory:":
+            return self.connection
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA busy_timeout=5000")
+            self.local.connection = connection
+            self.read_connections.append(connection)
+        return connection
+
+    def locations(self) -> list[Location]:
+        return self.read_connection().execute("SELECT DISTINCT lat, lon FROM cities").fetchall()
+
+    def touch(self, locations: list[Location], last_updated: datetime) -> None:
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "UPDATE cities SET last_updated = ? WHERE lat = ? AND lon = ?",
+                ((last_updated.isoformat(), lat, lon) for lat, lon in locations),
+            )
+
+    def close(self) -> None:
+        for connection in self.read_connections:
+            connection.close()
+        self.connection.close()
+
+
+def create_storage(backend: str, path: str = "") -> CityStorage:
+    """
+    Создаёт хранилище городов.
+
+    :param backend: 'memory' или 'sqlite'.
+    :param path: Путь к файлу базы для 'sqlite'.
+    :return: Хранилище.
+    :raises ValueError: Если тип хранилища неизвестен.
+    """
+    if backend == "memory":
+        return MemoryCityStorage()
+    if backend == "sqlite":
+        return SQLiteCityStorage(path or "weather.db")
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def benchmark(backend: str, path: str, users: int, cities_per_user: int, lookups: int) -> None:
+    """
+    Заполняет хранилище и измеряет время поиска по мере роста числа пользователей.
+
+    :param backend: Тип хранилища.
+    :param path: Путь к файлу базы.
+    :param users: Итоговое число пользователей.
+    :param cities_per_user: Городов на пользователя.
+    :param lookups: Число поисков на каждом шаге.
+    """
+    import random
+    import time
+
+    storage = create_storage(backend, path)
+    loaded, size = 0, 1000
+    print(f"{'users':>10} {'load, s':>8} {'get_city, us':>13} {'user_cities, us':>16}")
+    while loaded < users:
+        size = min(size * 10, users)
+        started = time.perf_counter()
+        storage.add_cities(
+            (f"city{city}", 50 + city % 10, 30 + user % 10, user)
+            for user in range(loaded, size)
+            for city in range(cities_per_user)
+        )
+        load_time = time.perf_counter() - started
+        loaded = size
+
+        sample = [random.randrange(loaded) for _ in range(lookups)]
+        started = time.perf_counter()
+        for user in sample:
+            storage.get_city(f"city{user % cities_per_user}", user)
+        city_time = (time.perf_counter() - started) / lookups * 1e6
+        started = time.perf_counter()
+        for user in sample:
+            storage.get_user_cities(user)
+        user_time = (time.perf_counter() - started) / lookups * 1e6
+        print(f"{loaded:>10} {load_time:>8.2f} {city_time:>13.2f} {user_time:>16.2f}")
+    storage.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска в хранилище городов")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="sqlite")
+    parser.add_argument("--path", default=":memory:", help="файл базы для sqlite")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--cities-per-user", type=int, default=3)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+    benchmark(args.backend, args.path, args.users, args.cities_per_user, args.lookups)